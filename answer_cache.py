@@ -0,0 +1,77 @@
+"""Bounded LRU cache for answers about one person.
+
+Each cached question type has a radius: the number of parent/child links
+between the person asked about and the people of any fact that can
+change the answer (CACHED_QUESTIONS in chatbot.py: 0 for parents, since
+only a link to the person themself matters; 1 for children and
+siblings; 2 for brothers and sisters, whose gender counts; 3 for uncles
+and aunts). When a fact about some people is learned, only entries for
+people within that many links of them are dropped.
+"""
+from collections import OrderedDict
+
+
+class AnswerCache:
+    def __init__(self, radius, maxsize=4096):
+        self.radius = radius  # intent -> radius
+        self.maxsize = maxsize
+        self.entries = OrderedDict()  # (intent, args) -> answer, least recent first
+        self.by_person = {}  # person -> keys of the entries about them
+        self._person = {}  # key -> person
+        self._reach = max(radius.values(), default=0)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        answer = self.entries.get(key)
+        if answer is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return answer
+
+    def put(self, key, person, answer):
+        self.entries[key] = answer
+        self._person[key] = person
+        self.by_person.setdefault(person, set()).add(key)
+        if len(self.entries) > self.maxsize:
+            self._drop(next(iter(self.entries)))
+
+    def _drop(self, key):
+        del self.entries[key]
+        person = self._person.pop(key)
+        keys = self.by_person[person]
+        keys.discard(key)
+        if not keys:
+            del self.by_person[person]
+
+    def invalidate(self, people, neighbours):
+        """Drop entries whose answers may depend on facts about ``people``.
+
+        ``neighbours(person)`` yields the people one parent/child link away.
+        """
+        if not self.entries:
+            return
+        frontier = set(people)
+        seen = set(frontier)
+        for distance in range(self._reach + 1):
+            for person in frontier:
+                for key in list(self.by_person.get(person, ())):
+                    if self.radius[key[0]] >= distance:
+                        self._drop(key)
+                        self.invalidations += 1
+            if distance == self._reach:
+                break
+            frontier = {n for p in frontier for n in neighbours(p)} - seen
+            seen |= frontier
+
+    def clear(self):
+        self.entries.clear()
+        self.by_person.clear()
+        self._person.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries),
+                "invalidations": self.invalidations}
@@ -0,0 +1,491 @@
+"""Knowledge-base engines behind PrologFamilyBot.
+
+Both backends store the same base facts (father/2, mother/2, parent/2,
+male/1, female/1) and answer the predicates defined by RULES:
+
+    assert_fact(pred, *args)    add one base fact
+    assert_bulk(facts)          add many (pred, *args) base facts at once
+    assert_tables(graph, gender, fathers, mothers)
+                                add a restored snapshot: every edge of an
+                                AncestorIndex as parent/2, every gender in a
+                                GenderArray, and (parent, child) pairs as
+                                father/2 and mother/2
+    holds(pred, *args)          True if the ground goal is provable; stops at
+                                the first proof
+    holds_many(pred, arg_lists) holds() for many argument tuples in one call
+    solutions(pred, *args)      distinct values for the single None argument,
+                                in the order they are first derived
+    first(pred, *args)          the first of those values, or None, without
+                                deriving the rest
+    facts(pred)                 stored base facts as tuples
+    clear()                     drop every base fact, keep the rules
+
+Arguments and answers are integer person ids (see people.py); an id that
+was never asserted, such as people.UNKNOWN, simply matches nothing.
+"""
+import os
+import tempfile
+from array import array
+from itertools import chain
+
+from family_graph import AncestorIndex
+from people import FEMALE, MALE, UNKNOWN, GenderArray
+
+try:
+    from pyswip import Functor, Prolog, Query, Variable, call
+    from pyswip.core import PL_discard_foreign_frame, PL_open_foreign_frame
+except ImportError:  # pyswip is only needed by PrologBackend
+    Prolog = None
+
+# base facts the bot asserts; everything else is derived by RULES
+DYNAMIC_PREDICATES = ["parent/2", "father/2", "mother/2", "male/1", "female/1"]
+
+RULES = [
+    "parent(X,Y) :- father(X,Y)",
+    "parent(X,Y) :- mother(X,Y)",
+
+    "sibling(X,Y) :- parent(P,X), parent(P,Y), X \\= Y",
+    "share_parent(X,Y) :- parent(P,X), parent(P,Y)",
+
+    "brother(X,Y) :- sibling(X,Y), male(X)",
+    "sister(X,Y) :- sibling(X,Y), female(X)",
+
+    "parent_sibling(X,Y) :- parent(P,Y), sibling(X,P)",
+    "uncle(X,Y) :- parent(P,Y), sibling(X,P), male(X)",
+    "aunt(X,Y) :- parent(P,Y), sibling(X,P), female(X)",
+
+    "grandparent(X,Y) :- parent(X,Z), parent(Z,Y)",
+    "grandfather(X,Y) :- grandparent(X,Y), male(X)",
+    "grandmother(X,Y) :- grandparent(X,Y), female(X)",
+
+    "child(X,Y) :- parent(Y,X)",
+    "son(X,Y) :- child(X,Y), male(X)",
+    "daughter(X,Y) :- child(X,Y), female(X)",
+
+    "ancestor(X,Y) :- parent(X,Y)",
+    "ancestor(X,Y) :- parent(X,Z), ancestor(Z,Y)",
+
+    "relative(X,Y) :- parent(X,Y)",
+    "relative(X,Y) :- parent(Y,X)",
+    "relative(X,Y) :- sibling(X,Y)",
+    "relative(X,Y) :- grandparent(X,Y)",
+    "relative(X,Y) :- grandparent(Y,X)",
+    "relative(X,Y) :- uncle(X,Y)",
+    "relative(X,Y) :- aunt(X,Y)",
+    "relative(X,Y) :- uncle(Y,X)",
+    "relative(X,Y) :- aunt(Y,X)",
+]
+
+# recursive or heavily re-derived predicates memoized in tabled mode
+TABLED_PREDICATES = ["ancestor/2", "sibling/2", "relative/2"]
+
+
+def _goal(pred, args):
+    return f"{pred}({','.join('X' if a is None else str(a) for a in args)})"
+
+
+def _table_facts(graph, gender, fathers, mothers):
+    """assert_tables() arguments as (pred, *args) facts."""
+    facts = [(pred, person) for person, code in enumerate(gender.codes(len(gender)))
+             for pred, flag in (('male', MALE), ('female', FEMALE)) if code & flag]
+    facts += [('parent', p, c) for p, c in graph.edges()]
+    facts += [('father', p, c) for p, c in fathers]
+    facts += [('mother', p, c) for p, c in mothers]
+    return facts
+
+
+class PrologBackend:
+    """SWI-Prolog through pyswip; the rules above run as Prolog clauses.
+
+    Per-question goals are built as terms from one cached Functor per goal
+    shape, with the arguments bound directly; only the bulk paths send
+    goal text to the Prolog parser. Each such goal is built and run inside
+    its own foreign frame, as pyswip's Prolog.query does, so its term refs
+    and compound terms are released once it is answered and the stacks of
+    a long-running bot stay flat.
+
+    pyswip runs one engine per process. Independent knowledge bases share
+    it by living in different SWI modules: every fact, rule and goal of a
+    backend is qualified with its ``module``.
+    """
+
+    def __init__(self, tabled=False, module="user"):
+        if Prolog is None:
+            raise ImportError("the prolog backend needs pyswip (pip install pyswip)")
+        self.prolog = Prolog()
+        self.tabled = tabled
+        self.module = module
+        self._m = "" if module == "user" else f"{module}:"
+        self._functors = {}
+        self._assertz = Functor("assertz", 1)
+        self._colon = Functor(":", 2)
+        self._load_rules()
+
+    def _load_rules(self):
+        if self.tabled:
+            self._consult_tabled_rules()
+            return
+        for pred in DYNAMIC_PREDICATES:
+            list(self.prolog.query(f"dynamic {self._m}{pred}."))
+        for rule in RULES:
+            self.prolog.assertz(f"{self._m}({rule})" if self._m else rule)
+
+    def _consult_tabled_rules(self):
+        # Tables and directives can only be declared from source, so the rule
+        # set is written to a temporary file. Incremental tabling makes every
+        # assertz into a dynamic predicate invalidate the tables built on it.
+        lines = [f":- module({self.module}, [])."] if self._m else []
+        lines += [f":- dynamic([{', '.join(DYNAMIC_PREDICATES)}], [incremental(true)])."]
+        lines += [f":- table {pred} as incremental." for pred in TABLED_PREDICATES]
+        lines += [f"{rule}." for rule in RULES]
+        fd, path = tempfile.mkstemp(suffix=".pl")
+        with os.fdopen(fd, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        try:
+            self.prolog.consult(path)
+        finally:
+            os.remove(path)
+
+    def _template(self, pred, arity):
+        functor = self._functors.get((pred, arity))
+        if functor is None:
+            functor = self._functors[(pred, arity)] = Functor(pred, arity)
+        return functor
+
+    def _term(self, pred, args):
+        term = self._template(pred, len(args))(*args)
+        return self._colon(self.module, term) if self._m else term
+
+    def _solve(self, pred, args):
+        """Yield the value of the None argument (None for ground goals) per solution."""
+        frame = PL_open_foreign_frame()
+        try:
+            unknown = Variable()
+            query = Query(self._term(pred, [unknown if a is None else a for a in args]))
+            try:
+                while query.nextSolution():
+                    yield unknown.value if None in args else None
+            finally:
+                query.closeQuery()
+        finally:
+            PL_discard_foreign_frame(frame)
+
+    def _call(self, goal):
+        frame = PL_open_foreign_frame()
+        try:
+            return bool(call(goal()))
+        finally:
+            PL_discard_foreign_frame(frame)
+
+    def assert_fact(self, pred, *args):
+        # assertz copies the clause, so the frame can go
+        self._call(lambda: self._assertz(self._term(pred, args)))
+
+    def assert_bulk(self, facts):
+        """Assert many ground facts with one Prolog call that reads them from a file."""
+        fd, path = tempfile.mkstemp(suffix=".pl")
+        with os.fdopen(fd, "w") as f:
+            for pred, *args in facts:
+                f.write(f"{_goal(pred, args)}.\n")
+        try:
+            source = path.replace("\\", "/")
+            list(self.prolog.query(
+                f"setup_call_cleanup(open('{source}', read, S), "
+                f"(repeat, read_term(S, T, []), (T == end_of_file -> ! ; assertz({self._m}T), fail)), "
+                "close(S))"))
+        finally:
+            os.remove(path)
+
+    def assert_tables(self, graph, gender, fathers, mothers):
+        self.assert_bulk(_table_facts(graph, gender, fathers, mothers))
+
+    def holds(self, pred, *args):
+        # PL_call runs the goal as once/1: no choice points are left behind
+        # and no query stays open
+        return self._call(lambda: self._term(pred, args))
+
+    def holds_many(self, pred, arg_lists):
+        # one findall over an indexed list of argument tuples; the answer is
+        # the indexes whose goal succeeds
+        if not arg_lists:
+            return []
+        params = ",".join(f"A{k}" for k in range(len(arg_lists[0])))
+        items = ",".join(f"{i}-t({','.join(map(str, args))})" for i, args in enumerate(arg_lists))
+        goal = f"findall(I, (member(I-t({params}), [{items}]), once({self._m}{pred}({params}))), L)"
+        hits = set(list(self.prolog.query(goal))[0]['L'])
+        return [i in hits for i in range(len(arg_lists))]
+
+    def solutions(self, pred, *args):
+        return list(dict.fromkeys(self._solve(pred, args)))
+
+    def first(self, pred, *args):
+        answers = self._solve(pred, args)
+        try:
+            return next(answers, None)
+        finally:
+            answers.close()  # closes the Prolog query
+
+    def facts(self, pred):
+        arity = 1 if pred in ('male', 'female') else 2
+        names = ["X", "Y"][:arity]
+        # clause/2 with body true skips the parent/2 rules
+        goal = f"clause({self._m}{pred}({','.join(names)}), true)"
+        return [tuple(sol[n] for n in names) for sol in self.prolog.query(goal)]
+
+    def clear(self):
+        # retract/1 only matches facts, so the parent/2 rules survive
+        for pred in DYNAMIC_PREDICATES:
+            name, arity = pred.split("/")
+            args = ",".join("_" * int(arity))
+            list(self.prolog.query(f"forall(retract({self._m}{name}({args})), true)"))
+
+
+class RoleColumn:
+    """The fathers (or the mothers) of every child id.
+
+    The first one is kept in a flat int32 column, UNKNOWN where there is
+    none; a child given a second one (which the bot allows) keeps the rest
+    in a dict.
+    """
+
+    def __init__(self):
+        self.first = array('i')
+        self.more = {}  # child -> further parents in this role
+
+    def __getitem__(self, child):
+        if not 0 <= child < len(self.first) or self.first[child] == UNKNOWN:
+            return []
+        return [self.first[child], *self.more.get(child, ())]
+
+    def add(self, parent, child):
+        first = self.first
+        if child >= len(first):
+            first.extend(array('i', [UNKNOWN]) * (child + 1 - len(first)))
+        if first[child] == UNKNOWN:
+            first[child] = parent
+        elif parent != first[child]:
+            more = self.more.setdefault(child, [])
+            if parent not in more:
+                more.append(parent)
+
+    def extend(self, pairs):
+        """add() every (parent, child) pair; one pass over a grown column."""
+        first = self.first
+        size = max((child for _, child in pairs), default=-1) + 1
+        if size > len(first):
+            first.extend(array('i', [UNKNOWN]) * (size - len(first)))
+        for parent, child in pairs:
+            if first[child] == UNKNOWN:
+                first[child] = parent
+            elif parent != first[child]:
+                more = self.more.setdefault(child, [])
+                if parent not in more:
+                    more.append(parent)
+
+    def pairs(self):
+        """Every (parent, child) pair, by child."""
+        for child, parent in enumerate(self.first):
+            if parent != UNKNOWN:
+                yield parent, child
+                for other in self.more.get(child, ()):
+                    yield other, child
+
+
+class NativeBackend:
+    """Pure-Python engine over integer person ids; no Prolog involved.
+
+    Person ids are dense (they come from the bot's PersonRegistry), so
+    they index the tables directly. Parents and children are the tables
+    of a family_graph.AncestorIndex, father/mother facts two RoleColumns,
+    and gender is a people.GenderArray. The bot shares
+    its index (``graph``) and gender array (``gender``), so the engine
+    and the bot read one copy of the pedigree. Every rule in RULES has a
+    native counterpart in both directions: ``_up[pred](y)`` yields every X with
+    pred(X, y) and ``_down[pred](x)`` every Y with pred(x, Y).
+    """
+
+    def __init__(self, gender=None, graph=None):
+        self.graph = AncestorIndex() if graph is None else graph
+        self.parents = self.graph.parents
+        self.children = self.graph.children
+        self.fathers = RoleColumn()
+        self.mothers = RoleColumn()
+        self.gender = GenderArray() if gender is None else gender
+        self._up = {
+            'parent': lambda y: self.parents[y],
+            'father': lambda y: self.fathers[y],
+            'mother': lambda y: self.mothers[y],
+            'child': lambda y: self.children[y],
+            'son': lambda y: self._only(MALE, self.children[y]),
+            'daughter': lambda y: self._only(FEMALE, self.children[y]),
+            'sibling': self._siblings,
+            'share_parent': self._share_parent,
+            'brother': lambda y: self._only(MALE, self._siblings(y)),
+            'sister': lambda y: self._only(FEMALE, self._siblings(y)),
+            'parent_sibling': self._parent_siblings,
+            'uncle': lambda y: self._only(MALE, self._parent_siblings(y)),
+            'aunt': lambda y: self._only(FEMALE, self._parent_siblings(y)),
+            'grandparent': self._grandparents,
+            'grandfather': lambda y: self._only(MALE, self._grandparents(y)),
+            'grandmother': lambda y: self._only(FEMALE, self._grandparents(y)),
+            'ancestor': lambda y: self._closure(y, self.parents),
+            'relative': self._relatives,
+        }
+        self._down = {
+            'parent': lambda x: self.children[x],
+            'father': lambda x: [c for c in self.children[x] if x in self.fathers[c]],
+            'mother': lambda x: [c for c in self.children[x] if x in self.mothers[c]],
+            'child': lambda x: self.parents[x],
+            'son': lambda x: self._if(MALE, x, self.parents[x]),
+            'daughter': lambda x: self._if(FEMALE, x, self.parents[x]),
+            'sibling': self._siblings,
+            'share_parent': self._share_parent,
+            'brother': lambda x: self._if(MALE, x, self._siblings(x)),
+            'sister': lambda x: self._if(FEMALE, x, self._siblings(x)),
+            'parent_sibling': self._nephews,
+            'uncle': lambda x: self._if(MALE, x, self._nephews(x)),
+            'aunt': lambda x: self._if(FEMALE, x, self._nephews(x)),
+            'grandparent': self._grandchildren,
+            'grandfather': lambda x: self._if(MALE, x, self._grandchildren(x)),
+            'grandmother': lambda x: self._if(FEMALE, x, self._grandchildren(x)),
+            'ancestor': lambda x: self._closure(x, self.children),
+            'relative': self._relatives,
+        }
+
+    def _known(self, person):
+        return person is not None and person in self.graph
+
+    def assert_fact(self, pred, *args):
+        if pred in ('male', 'female'):
+            person = args[0]
+            self.gender.set(person, self.gender.get(person) | (MALE if pred == 'male' else FEMALE))
+            return
+        parent, child = args
+        if pred in ('father', 'mother'):
+            (self.fathers if pred == 'father' else self.mothers).add(parent, child)
+        # a shared index already holds the links the bot recorded
+        self.graph.add(parent, child)
+
+    def assert_bulk(self, facts):
+        links = []
+        for pred, *args in facts:
+            if pred in ('male', 'female'):
+                self.assert_fact(pred, *args)
+                continue
+            if pred != 'parent':
+                (self.fathers if pred == 'father' else self.mothers).add(*args)
+            links.append(tuple(args))
+        # a shared index already holds the links the bot recorded
+        fresh = [(p, c) for p, c in dict.fromkeys(links) if p not in self.graph.parents_of(c)]
+        if fresh:
+            self.graph.extend(fresh, self.graph.topological_order(fresh))
+
+    def assert_tables(self, graph, gender, fathers, mothers):
+        if graph is not self.graph or gender is not self.gender:
+            self.assert_bulk(_table_facts(graph, gender, fathers, mothers))
+            return
+        # the bot restored the shared tables; only the roles are left
+        self.fathers.extend(fathers)
+        self.mothers.extend(mothers)
+
+    def holds(self, pred, *args):
+        if pred in ('male', 'female'):
+            return bool(self.gender.get(args[0]) & (MALE if pred == 'male' else FEMALE))
+        if not all(map(self._known, args)):
+            return False
+        x, y = args
+        # the relations are lazy where it pays (ancestor, relative), so the
+        # membership test stops at the first match
+        return x in self._up[pred](y)
+
+    def holds_many(self, pred, arg_lists):
+        return [self.holds(pred, *args) for args in arg_lists]
+
+    def solutions(self, pred, *args):
+        x, y = args
+        if x is None:
+            person, table = y, self._up
+        else:
+            person, table = x, self._down
+        if not self._known(person):
+            return []
+        return list(dict.fromkeys(table[pred](person)))
+
+    def first(self, pred, *args):
+        x, y = args
+        if x is None:
+            person, table = y, self._up
+        else:
+            person, table = x, self._down
+        if not self._known(person):
+            return None
+        return next(iter(table[pred](person)), None)
+
+    def facts(self, pred):
+        if pred in ('male', 'female'):
+            flag = MALE if pred == 'male' else FEMALE
+            return [(p,) for p, g in enumerate(self.gender.codes(len(self.gender))) if g & flag]
+        if pred == 'parent':
+            return self.graph.edges()
+        return list((self.fathers if pred == 'father' else self.mothers).pairs())
+
+    def clear(self):
+        self.graph.clear()
+        self.fathers = RoleColumn()
+        self.mothers = RoleColumn()
+        self.gender.clear()
+
+    # relation helpers over ids
+
+    def _only(self, flag, people):
+        return self.gender.select(people, flag)
+
+    def _if(self, flag, person, people):
+        return people if self.gender.get(person) & flag else []
+
+    def _siblings(self, person):
+        return [c for p in self.parents[person] for c in self.children[p] if c != person]
+
+    def _share_parent(self, person):
+        return [c for p in self.parents[person] for c in self.children[p]]
+
+    def _parent_siblings(self, person):
+        return [s for p in self.parents[person] for s in self._siblings(p)]
+
+    def _nephews(self, person):
+        return [c for s in self._siblings(person) for c in self.children[s]]
+
+    def _grandparents(self, person):
+        return [g for p in self.parents[person] for g in self.parents[p]]
+
+    def _grandchildren(self, person):
+        return [g for c in self.children[person] for g in self.children[c]]
+
+    def _closure(self, person, edges):
+        found = set()
+        stack = [person]
+        while stack:
+            for nxt in edges[stack.pop()]:
+                if nxt not in found:
+                    found.add(nxt)
+                    stack.append(nxt)
+                    yield nxt
+
+    def _relatives(self, person):
+        nephews = self._nephews(person) if self.gender.get(person) else []
+        return chain(self.parents[person], self.children[person], self._siblings(person),
+                     self._grandparents(person), self._grandchildren(person),
+                     self._up['uncle'](person), self._up['aunt'](person), nephews)
+
+
+BACKENDS = {"prolog": PrologBackend, "native": NativeBackend}
+
+
+def make_backend(name, tabled=False, module="user", gender=None, graph=None):
+    """Build a backend; the native engine shares ``gender`` (a GenderArray)
+    and ``graph`` (an AncestorIndex) with the caller."""
+    if name == "prolog":
+        return PrologBackend(tabled=tabled, module=module)
+    if name not in BACKENDS:
+        raise ValueError(f"unknown backend {name!r}; choose from {', '.join(BACKENDS)}")
+    return BACKENDS[name](gender, graph)
@@ -0,0 +1,556 @@
+"""Micro-benchmarks for the family bots.
+
+Run ``python bench.py`` to execute every benchmark, or name the ones to run,
+e.g. ``python bench.py dispatch``. bench_suite.py times every sentence
+pattern on every bot and keeps JSON baselines.
+"""
+import multiprocessing
+import random
+import re
+import string
+import sys
+import time
+
+from dispatch import NAME, IntentDispatcher
+
+
+def timeit(fn, repeat=2000):
+    """Mean wall time of fn() in microseconds."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def person_name(i):
+    """Distinct name matching the bots' [A-Z][a-z]* grammar for person i."""
+    letters = []
+    while True:
+        i, r = divmod(i, 26)
+        letters.append(string.ascii_lowercase[r])
+        if not i:
+            break
+    return "P" + "".join(letters)
+
+
+def random_pedigree(n, width=1000, seed=0):
+    """(father, mother, child) triples for n people in generations of ``width``.
+
+    Each person outside the first generation gets a father and a mother from
+    the previous generation; even ids are male, odd ids are female.
+    """
+    rng = random.Random(seed)
+    triples = []
+    for child in range(width, n):
+        gen_start = (child // width - 1) * width
+        father = gen_start + 2 * rng.randrange(width // 2)
+        mother = gen_start + 2 * rng.randrange(width // 2) + 1
+        triples.append((father, mother, child))
+    return triples
+
+
+def bench_dispatch():
+    """Per-line parse cost as more sentence types are added."""
+    from chatbot import QUESTION_RULES
+
+    line = "Are Bob and Ann relatives"
+    print(f"{'rules':>6} {'re.match chain (us)':>20} {'dispatcher (us)':>16}")
+    for extra in (0, 50, 200, 1000):
+        synthetic = [(rf"^Is {NAME} the relation{i} of {NAME}$", f"_ask_{i}") for i in range(extra)]
+        rules = synthetic + QUESTION_RULES
+
+        def chain():
+            for pattern, intent in rules:
+                m = re.match(pattern, line)
+                if m:
+                    return intent, m.groups()
+            return None, ()
+
+        dispatcher = IntentDispatcher(rules)
+        assert chain() == dispatcher.match(line)
+        print(f"{len(rules):>6} {timeit(chain, 200):>20.2f} {timeit(lambda: dispatcher.match(line)):>16.2f}")
+
+
+def bench_ancestry():
+    """Cycle check + insert cost on deep chains entered top-down and bottom-up."""
+    from family_graph import AncestorIndex
+
+    for n in (1_000, 10_000, 100_000):
+        for label, edges in (("top-down", [(i, i + 1) for i in range(n)]),
+                             ("bottom-up", [(i, i + 1) for i in reversed(range(n))])):
+            index = AncestorIndex()
+            start = time.perf_counter()
+            for parent, child in edges:
+                if not index.would_create_cycle(parent, child):
+                    index.add(parent, child)
+            per_edge = (time.perf_counter() - start) / n * 1e6
+            start = time.perf_counter()
+            assert index.would_create_cycle(n, 0)
+            print(f"{n:>8} {label:>9}: {per_edge:.2f} us/insert, cycle rejected in "
+                  f"{(time.perf_counter() - start) * 1e6:.1f} us")
+
+
+TREE_SIZES = (10_000, 100_000, 1_000_000)
+
+
+def collapsed_pedigree(depth):
+    """(parent, child) edges of a pedigree where everyone has the same two parents.
+
+    Generation g has persons 2g and 2g+1, both children of 2g-2 and 2g-1, so
+    the bottom of the pedigree reaches the top along 2**depth paths.
+    """
+    return [(2 * (g - 1) + p, 2 * g + c) for g in range(1, depth + 1) for p in (0, 1) for c in (0, 1)]
+
+
+def _tabling_worker(tabled, n, queue):
+    from chatbot import PrologFamilyBot
+
+    # pedigree numbers are used directly as person ids
+    bot = PrologFamilyBot(tabled=tabled)
+    for f, m, c in random_pedigree(n):
+        bot.kb.assert_fact('father', f, c)
+        bot.kb.assert_fact('mother', m, c)
+        bot.kb.assert_fact('male', f)
+        bot.kb.assert_fact('female', m)
+    rng = random.Random(1)
+    goals = []
+    for _ in range(20):
+        a, b = (rng.randrange(n // 2, n) for _ in range(2))
+        goals += [f"ancestor(X,{a}), ancestor(X,{b})", f"relative({a},{b})"]
+    timings = []
+    for _ in range(2):  # the second pass shows warm tables
+        start = time.perf_counter()
+        for goal in goals:
+            list(bot.kb.prolog.query(goal))
+        timings.append((time.perf_counter() - start) / len(goals) * 1e3)
+    queue.put(timings)
+
+
+def bench_tabling():
+    """Untabled vs tabled ancestor/relative latency on generated pedigrees."""
+    # pyswip shares one engine per process, so each mode gets a fresh process
+    ctx = multiprocessing.get_context("spawn")
+    for n in TREE_SIZES:
+        for tabled in (False, True):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_tabling_worker, args=(tabled, n, queue))
+            proc.start()
+            cold, warm = queue.get()
+            proc.join()
+            mode = "tabled" if tabled else "untabled"
+            print(f"{n:>9} {mode:>9}: cold {cold:.2f} ms/query, warm {warm:.2f} ms/query")
+
+
+def bench_bulk_load(n=150_000):
+    """Statement-at-a-time ingestion vs load_facts for ~2n relationships."""
+    from chatbot import PrologFamilyBot
+
+    records = []
+    for father, mother, child in random_pedigree(n):
+        f, m, c = (person_name(i) for i in (father, mother, child))
+        records += [("father", f, c), ("mother", m, c)]
+    sample = records[:5_000]
+    bot = PrologFamilyBot()
+    start = time.perf_counter()
+    for relation, parent, child in sample:
+        bot.handle_input(f"{parent} is the {relation} of {child}.")
+    per_statement = (time.perf_counter() - start) / len(sample)
+    print(f"handle_input: {per_statement * 1e6:.1f} us/statement, "
+          f"~{per_statement * len(records):.1f} s projected for {len(records)} facts")
+    start = time.perf_counter()
+    ok, message = bot.load_facts(records[len(sample):])
+    print(f"load_facts: {message} in {time.perf_counter() - start:.2f} s")
+
+
+def bench_prolog_stacks(calls=1_000_000, n=10_000):
+    """Soak the Prolog backend's typed calls and check the SWI stacks stay flat."""
+    from backends import PrologBackend
+
+    kb = PrologBackend()
+    kb.assert_bulk([(relation, p, c) for f, m, c in random_pedigree(n)
+                    for relation, p in (("father", f), ("mother", m))])
+
+    def used():
+        return [list(kb.prolog.query(f"statistics({key}, X)"))[0]["X"]
+                for key in ("localused", "globalused", "trailused")]
+
+    rng = random.Random(5)
+    start = used()
+    samples = []
+    began = time.perf_counter()
+    for i in range(calls):
+        x, y = rng.randrange(n), rng.randrange(n)
+        kind = i % 4
+        if kind == 0:
+            kb.holds("ancestor", x, y)
+        elif kind == 1:
+            kb.holds_many("sibling", [(x, y), (y, x)])
+        elif kind == 2:
+            kb.first("parent", None, y)
+        else:
+            kb.solutions("child", None, x)
+        if (i + 1) % (calls // 10) == 0:
+            samples.append(used())
+    elapsed = time.perf_counter() - began
+    for i, sample in enumerate(samples, 1):
+        print(f"{i * calls // 10:>9} calls: local {sample[0]}, global {sample[1]}, trail {sample[2]} bytes")
+    growth = [after - before for before, after in zip(start, samples[-1])]
+    print(f"{calls} calls in {elapsed:.1f} s; stack growth local {growth[0]}, global {growth[1]}, "
+          f"trail {growth[2]} bytes ({'flat' if not any(growth) else 'GROWING'})")
+
+
+def bench_memory(n=1_000_000):
+    """Traced bytes per person of a native bot holding an n-person pedigree."""
+    import tracemalloc
+
+    from chatbot import PrologFamilyBot
+
+    tracemalloc.start()
+    names = [person_name(i) for i in range(n)]
+    records = []
+    for f, m, c in random_pedigree(n):
+        records += [("father", names[f], names[c]), ("mother", names[m], names[c])]
+    bot = PrologFamilyBot(backend="native")
+    ok, message = bot.load_facts(records)
+    del names, records  # the bot keeps the name strings it needs
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{len(bot.people)} people ({message}): {used / 2 ** 20:.0f} MiB, "
+          f"{used / len(bot.people):.0f} bytes/person")
+
+
+def bench_snapshot(n=1_000_000):
+    """Write an n-person snapshot, read it back, and restore it into a native bot."""
+    import os
+    import tempfile
+
+    import snapshot
+    from chatbot import PrologFamilyBot
+    from family_graph import AncestorIndex
+
+    names = [person_name(i) for i in range(n)]
+    genders, parents, fathers, mothers = bytearray(n), [], [], []
+    for f, m, c in random_pedigree(n):
+        genders[f], genders[m] = 1, 2
+        parents += [(f, c), (m, c)]
+        fathers.append((f, c))
+        mothers.append((m, c))
+    index = AncestorIndex()
+    index.extend(parents, index.topological_order(parents))
+    path = os.path.join(tempfile.mkdtemp(), "kb.snapshot")
+    start = time.perf_counter()
+    snapshot.write(path, names, genders, index.rank, index.parents, index.children, fathers, mothers)
+    written = time.perf_counter() - start
+    start = time.perf_counter()
+    snapshot.read(path)
+    read = time.perf_counter() - start
+    bot = PrologFamilyBot(backend="native")
+    start = time.perf_counter()
+    bot.load(path)
+    print(f"{len(parents) + len(fathers) + len(mothers) + n - genders.count(0)} facts, "
+          f"{os.path.getsize(path) / 1e6:.1f} MB: write {written:.2f} s, "
+          f"read {read:.2f} s, restore {time.perf_counter() - start:.2f} s")
+    os.remove(path)
+
+
+def simple_bot_with_pedigree(n):
+    """SimpleFamilyChatbot preloaded with an n-person pedigree, skipping the per-edge checks."""
+    from testingBot import SimpleFamilyChatbot
+
+    bot = SimpleFamilyChatbot()
+    for i in range(n):  # pedigree numbers become the person ids
+        bot.people.intern(person_name(i))
+    for f, m, c in random_pedigree(n):
+        bot._set_gender(f, 'male')
+        bot._set_gender(m, 'female')
+        bot._link(f, c)
+        bot._link(m, c)
+    return bot
+
+
+def bench_simple_children(n=1_000_000):
+    """Who are the sons/daughters/children: full scan vs the reverse index."""
+    bot = simple_bot_with_pedigree(n)
+    person = n - 2000  # someone in the last generation with children
+
+    def scan():
+        return [c for c in bot.ancestry.people() if bot.is_parent(person, c) and bot.gender.get(c) == 'female']
+
+    assert sorted(scan()) == sorted(bot.daughters.get(person, ()))
+    print(f"{n} people: full scan {timeit(scan, 3) / 1e3:.1f} ms, "
+          f"indexed {timeit(lambda: bot.handle_question(f'Who are the daughters of {person_name(person)}?')):.1f} us")
+
+
+def bench_simple_cycle(n=1_000_000, depth=100_000):
+    """add_parent cost on a large pedigree and on a lineage deeper than the recursion limit."""
+    bot = simple_bot_with_pedigree(n)
+    rng = random.Random(2)
+    pairs = [(rng.randrange(n // 2), rng.randrange(n // 2, n)) for _ in range(1000)]
+    start = time.perf_counter()
+    for older, younger in pairs:
+        bot.add_parent(older, younger)
+    forward = (time.perf_counter() - start) / len(pairs) * 1e6
+    start = time.perf_counter()
+    for older, younger in pairs[:20]:
+        bot.add_parent(younger, older)  # against the current order: search and local reorder
+    backward = (time.perf_counter() - start) / 20 * 1e6
+    print(f"{n} people: {forward:.1f} us per consistent insert, {backward:.1f} us per reversed insert")
+
+    from testingBot import SimpleFamilyChatbot
+
+    deep = SimpleFamilyChatbot()
+    start = time.perf_counter()
+    for i in range(depth):
+        deep.handle_input(f"{person_name(i)} is a child of {person_name(i + 1)}.")
+    per_line = (time.perf_counter() - start) / depth * 1e6
+    answer = deep.handle_input(f"{person_name(depth)} is a child of {person_name(0)}.")
+    print(f"{depth}-generation lineage: {per_line:.1f} us/statement, closing cycle -> {answer}")
+
+
+def bench_batch(n=10_000, backends=("native", "prolog")):
+    """Questions per second: handle_input one at a time vs answer_batch."""
+    from chatbot import PrologFamilyBot
+
+    triples = random_pedigree(5_000, width=500)
+    rng = random.Random(3)
+    questions = []
+    for _ in range(n):
+        father, _, child = rng.choice(triples)
+        if rng.random() < 0.5:
+            father = rng.choice(triples)[0]
+        questions.append(f"Is {person_name(father)} the father of {person_name(child)}?")
+    for backend in backends:
+        try:
+            bot = PrologFamilyBot(backend=backend)
+        except ImportError as exc:
+            print(f"{backend}: skipped ({exc})")
+            continue
+        bot.load_facts(("father", person_name(f), person_name(c)) for f, _, c in triples)
+        start = time.perf_counter()
+        single = [bot.handle_input(q) for q in questions]
+        one_by_one = n / (time.perf_counter() - start)
+        start = time.perf_counter()
+        assert bot.answer_batch(questions) == single
+        batched = n / (time.perf_counter() - start)
+        print(f"{backend}: {one_by_one:,.0f} q/s one at a time, {batched:,.0f} q/s batched")
+
+
+def bench_templates(n=5_000):
+    """Per-question latency: f-string goals through the parser vs cached term templates."""
+    from backends import PrologBackend, _goal
+
+    try:
+        kb = PrologBackend()
+    except ImportError as exc:
+        print(f"skipped ({exc})")
+        return
+    triples = random_pedigree(5_000, width=500)
+    kb.assert_bulk(("father", f, c) for f, _, c in triples)
+    rng = random.Random(4)
+    children = [rng.choice(triples)[2] for _ in range(n)]
+    for label, ask in (
+        ("f-string", lambda c: [s['X'] for s in kb.prolog.query(_goal('parent', (None, c)))]),
+        ("template", lambda c: kb.solutions('parent', None, c)),
+    ):
+        start = time.perf_counter()
+        for c in children:
+            ask(c)
+        print(f"{label}: {(time.perf_counter() - start) / n * 1e6:.1f} us/question")
+
+
+def bench_once(depths=(10, 14, 18)):
+    """Yes/no ancestor checks on collapsed pedigrees: every proof vs the first one."""
+    from backends import make_backend
+
+    for backend in ("native", "prolog"):
+        try:
+            kb = make_backend(backend)
+        except ImportError as exc:
+            print(f"{backend}: skipped ({exc})")
+            continue
+        for depth in depths:
+            kb.clear()
+            kb.assert_bulk(("parent", p, c) for p, c in collapsed_pedigree(depth))
+            top, bottom = 0, 2 * depth
+            if backend == "prolog":
+                every = lambda: bool(list(kb._solve('ancestor', (top, bottom))))
+            else:  # the whole ancestor set, as before the early exit
+                every = lambda: top in set(kb._up['ancestor'](bottom))
+            once = lambda: kb.holds('ancestor', top, bottom)
+            repeat = 5 if backend == "prolog" else 200
+            print(f"{backend} depth {depth}: all proofs {timeit(every, repeat) / 1e3:.3f} ms, "
+                  f"first proof {timeit(once, repeat) / 1e3:.3f} ms")
+
+
+def bench_server(clients=300, lines=20):
+    """Many concurrent sessions against server.py on the native backend."""
+    import asyncio
+
+    from chatbot import PrologFamilyBot
+    from server import ChatServer
+
+    def make_bot():
+        bot = PrologFamilyBot(backend="native")
+        bot.load_facts(("father", person_name(f), person_name(c)) for f, _, c in random_pedigree(5_000, width=500))
+        return bot
+
+    async def session(port, rng):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for _ in range(lines):
+            a, b = (person_name(rng.randrange(5_000)) for _ in range(2))
+            writer.write(f"Is {a} the father of {b}?\n".encode())
+            await writer.drain()
+            await reader.readline()
+        writer.close()
+
+    async def run():
+        server = ChatServer(make_bot)
+        listener = await server.start(port=0)
+        port = listener.sockets[0].getsockname()[1]
+        start = time.perf_counter()
+        await asyncio.gather(*(session(port, random.Random(i)) for i in range(clients)))
+        elapsed = time.perf_counter() - start
+        listener.close()
+        server.worker.stop()
+        print(f"{clients} clients: {clients * lines / elapsed:,.0f} lines/s; {server.report()}")
+
+    asyncio.run(run())
+
+
+def bench_replicas(n=40_000, workers=(1, 2, 4)):
+    """Question throughput of ReplicaPool.answer_batch as replicas are added."""
+    import os
+    import tempfile
+
+    from chatbot import PrologFamilyBot
+    from replicas import ReplicaPool
+
+    triples = random_pedigree(20_000, width=1000)
+    seed = PrologFamilyBot(backend="native")
+    seed.load_facts(("father", person_name(f), person_name(c)) for f, _, c in triples)
+    path = os.path.join(tempfile.mkdtemp(), "kb.snap")
+    seed.save(path)
+    rng = random.Random(5)
+    questions = [f"Are {person_name(rng.randrange(20_000))} and {person_name(rng.randrange(20_000))} siblings?"
+                 for _ in range(n)]
+    print(f"{os.cpu_count()} cores")
+    for count in workers:
+        with ReplicaPool(count, snapshot_path=path, backend="native") as pool:
+            start = time.perf_counter()
+            pool.answer_batch(questions)
+            print(f"{count} replicas: {n / (time.perf_counter() - start):,.0f} q/s")
+    os.remove(path)
+
+
+def bench_answer_cache(n=20_000, asked=500, repeat=20):
+    """Repeated "Who are the uncles/siblings/sons of X" questions with the answer cache."""
+    from chatbot import PrologFamilyBot
+
+    bot = PrologFamilyBot(backend="native")
+    triples = random_pedigree(n)
+    bot.load_facts(rec for f, m, c in triples
+                   for rec in (("father", person_name(f), person_name(c)),
+                               ("mother", person_name(m), person_name(c))))
+    rng = random.Random(6)
+    people = [person_name(rng.randrange(n // 2, n)) for _ in range(asked)]
+    questions = [f"Who are the {kind} of {p}?" for p in people for kind in ("uncles", "siblings", "sons")]
+    start = time.perf_counter()
+    for q in questions:
+        bot.handle_input(q)
+    cold = (time.perf_counter() - start) / len(questions) * 1e6
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for q in questions:
+            bot.handle_input(q)
+    warm = (time.perf_counter() - start) / (repeat * len(questions)) * 1e6
+    print(f"cold {cold:.1f} us/question, warm {warm:.1f} us/question; {bot.answers.stats()}")
+
+
+def bench_relatives(n=200_000):
+    """"Are A and B relatives?" on a deep pedigree: full ancestor set vs meeting in the middle."""
+    from family_graph import AncestorIndex
+
+    index = AncestorIndex()
+    triples = random_pedigree(n)
+    edges = [(p, c) for f, m, c in triples for p in (f, m)]
+    index.extend(edges, index.topological_order(edges))
+    rng = random.Random(7)
+    # pairs from the last generation: related through recent ancestors
+    pairs = [(rng.randrange(n - 1000, n), rng.randrange(n - 1000, n)) for _ in range(200)]
+
+    def full_ancestry(a, b):
+        mine = index.ancestors(a)
+        return b in mine or a in index.ancestors(b) or bool(mine & index.ancestors(b))
+
+    assert all(full_ancestry(a, b) == index.related(a, b) for a, b in pairs[:20] if a != b)
+    print(f"{n} people: full ancestor sets {timeit(lambda: [full_ancestry(a, b) for a, b in pairs], 1) / len(pairs):.1f} us, "
+          f"bidirectional {timeit(lambda: [index.related(a, b) for a, b in pairs], 5) / len(pairs):.1f} us per pair")
+
+
+def bench_kinship(n=200_000, asked=200):
+    """"How is A related to B?" vs probing the relationship one yes/no question at a time."""
+    from chatbot import PrologFamilyBot
+
+    bot = PrologFamilyBot(backend="native")
+    bot.load_facts(rec for f, m, c in random_pedigree(n)
+                   for rec in (("father", person_name(f), person_name(c)),
+                               ("mother", person_name(m), person_name(c)),
+                               ("male", person_name(f)), ("female", person_name(m))))
+    rng = random.Random(8)
+    pairs = [(person_name(rng.randrange(n - 3000, n)), person_name(rng.randrange(n - 3000, n)))
+             for _ in range(asked)]
+    probes = ["Is {0} the father of {1}?", "Is {0} the mother of {1}?", "Is {0} a grandfather of {1}?",
+              "Is {0} a grandmother of {1}?", "Are {0} and {1} siblings?", "Is {0} an uncle of {1}?",
+              "Is {0} an aunt of {1}?", "Is {0} a son of {1}?", "Is {0} a daughter of {1}?"]
+    start = time.perf_counter()
+    named = sum(any(bot.handle_input(probe.format(a, b)) == "Yes." for probe in probes) for a, b in pairs)
+    probing = (time.perf_counter() - start) / asked * 1e6
+    start = time.perf_counter()
+    answers = [bot.handle_input(f"How is {a} related to {b}?") for a, b in pairs]
+    asking = (time.perf_counter() - start) / asked * 1e6
+    print(f"{n} people: {len(probes)} probes {probing:.1f} us/pair, {named}/{asked} pairs named; "
+          f"one question {asking:.1f} us/pair, {sum('not related' not in a for a in answers)}/{asked} named")
+
+
+def bench_cousins(n=1_000_000, asked=100):
+    """N-th cousins k times removed on a large pedigree: cost per query and per cousin found."""
+    from family_graph import AncestorIndex
+
+    index = AncestorIndex()
+    edges = [(p, c) for f, m, c in random_pedigree(n) for p in (f, m)]
+    index.extend(edges, index.topological_order(edges))
+    rng = random.Random(9)
+    people = [rng.randrange(n - 1000, n) for _ in range(asked)]
+    for degree, removed in ((1, 0), (2, 0), (3, 0), (1, 1), (2, 1)):
+        start = time.perf_counter()
+        found = sum(len(index.cousins(p, degree, removed)) for p in people)
+        elapsed = (time.perf_counter() - start) * 1e6
+        print(f"{n} people, degree {degree} removed {removed}: {elapsed / asked:.0f} us/query, "
+              f"{found / asked:.1f} cousins/query, {elapsed / max(found, 1):.1f} us/cousin")
+
+
+BENCHMARKS = {
+    "dispatch": bench_dispatch,
+    "ancestry": bench_ancestry,
+    "tabling": bench_tabling,
+    "bulk_load": bench_bulk_load,
+    "prolog_stacks": bench_prolog_stacks,
+    "memory": bench_memory,
+    "snapshot": bench_snapshot,
+    "simple_children": bench_simple_children,
+    "simple_cycle": bench_simple_cycle,
+    "batch": bench_batch,
+    "templates": bench_templates,
+    "once": bench_once,
+    "server": bench_server,
+    "replicas": bench_replicas,
+    "answer_cache": bench_answer_cache,
+    "relatives": bench_relatives,
+    "kinship": bench_kinship,
+    "cousins": bench_cousins,
+}
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        print(f"== {name}")
+        BENCHMARKS[name]()
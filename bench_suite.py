@@ -0,0 +1,213 @@
+"""Reproducible benchmark suite: every sentence pattern on every bot.
+
+Each implementation is loaded with a seeded synthetic pedigree, one
+statement at a time, and then every question and statement pattern of
+differential.py is timed on random people from it. Every (implementation,
+shape, size) cell runs in its own spawned process, since pyswip shares one
+Prolog engine per process.
+
+    python bench_suite.py [--impl native simple] [--shape chain wide]
+                          [--sizes 1000 100000] [--out results.json]
+                          [--baseline base.json]
+
+Results are written as JSON: mean, median and p99 microseconds per
+pattern, keyed by ``impl/shape/size``. With ``--baseline`` every pattern
+whose median got slower than the stored one by more than ``--tolerance``
+is listed and the exit status is 1. ``--save-baseline`` writes the results as the new baseline.
+
+Timings only compare on the machine that took them, so no baseline is
+kept in the repository: record one from the base revision and compare
+the change against it on the same machine, e.g. in one CI job:
+
+    git checkout main && python bench_suite.py --baseline /tmp/base.json --save-baseline
+    git checkout -  && python bench_suite.py --baseline /tmp/base.json
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import sys
+import time
+
+from bench import person_name, random_pedigree
+from differential import QUESTIONS, STATEMENTS
+
+IMPLEMENTATIONS = ("prolog", "native", "original", "simple")
+SHAPES = ("chain", "wide", "collapse", "random")
+
+
+def _make_bot(impl):
+    if impl == "prolog":
+        from chatbot import PrologFamilyBot
+        return PrologFamilyBot(backend="prolog")
+    if impl == "native":
+        from chatbot import PrologFamilyBot
+        return PrologFamilyBot(backend="native")
+    if impl == "original":
+        from chatbotOriginal import PrologFamilyBot
+        return PrologFamilyBot()
+    if impl == "simple":
+        from testingBot import SimpleFamilyChatbot
+        return SimpleFamilyChatbot()
+    raise ValueError(f"unknown implementation {impl!r}")
+
+
+def wide_pedigree(n, sibship=50):
+    """(father, mother, child) triples where every couple has ``sibship`` children.
+
+    Even ids are male and odd ids female; each generation pairs its sons
+    with the daughters of the next sibship over, so no siblings marry.
+    """
+    triples = []
+    couples = [(0, 1)]
+    born = 2
+    while born < n and couples:
+        children = []
+        for father, mother in couples:
+            for child in range(born, min(born + sibship, n)):
+                triples.append((father, mother, child))
+                children.append(child)
+            born = min(born + sibship, n)
+        sons = [c for c in children if c % 2 == 0]
+        daughters = [c for c in children if c % 2]
+        shift = sibship // 2
+        couples = list(zip(sons, daughters[shift:] + daughters[:shift]))
+    return triples
+
+
+def pedigree(shape, n, seed=0):
+    """(relation, parent, child) records of an n-person pedigree of the given shape.
+
+    chain     one lineage n generations deep, father to son
+    wide      sibships of 50 children per couple
+    collapse  generations of 8 people, so every ancestor is reached along
+              many paths
+    random    generations of up to 1000 people with random parents
+    """
+    if shape == "chain":
+        return [('father', i - 1, i) for i in range(1, n)]
+    if shape == "wide":
+        triples = wide_pedigree(n)
+    elif shape == "collapse":
+        triples = random_pedigree(n, width=8, seed=seed)
+    elif shape == "random":
+        triples = random_pedigree(n, width=max(2, min(1000, n // 10)) & ~1, seed=seed)
+    else:
+        raise ValueError(f"unknown pedigree shape {shape!r}")
+    return [record for f, m, c in triples for record in (('father', f, c), ('mother', m, c))]
+
+
+def _timed(bot, lines):
+    times = []
+    for line in lines:
+        start = time.perf_counter()
+        bot.handle_input(line)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {"mean_us": sum(times) / len(times) * 1e6,
+            "median_us": times[len(times) // 2] * 1e6,
+            "p99_us": times[min(len(times) - 1, int(0.99 * len(times)))] * 1e6}
+
+
+def run_cell(impl, shape, n, seed=0, samples=200):
+    """Timings of one implementation on one pedigree, keyed by pattern."""
+    bot = _make_bot(impl)
+    rng = random.Random(seed)
+    results = {}
+    start = time.perf_counter()
+    results["load"] = _timed(bot, [f"{person_name(p)} is the {relation} of {person_name(c)}."
+                                   for relation, p, c in pedigree(shape, n, seed)])
+    results["load"]["total_s"] = time.perf_counter() - start
+    for template in QUESTIONS:
+        results[template] = _timed(bot, [template.format(*(person_name(rng.randrange(n)) for _ in range(4)))
+                                         for _ in range(samples)])
+    # statements last, since they change the pedigree: new people about existing ones
+    fresh = iter(range(n, n + len(STATEMENTS) * samples * 3))
+    for template in STATEMENTS:
+        slots = template.count("{")
+        lines = []
+        for _ in range(samples):
+            names = [person_name(next(fresh)) for _ in range(slots - 1)]
+            lines.append(template.format(*names, person_name(rng.randrange(n))))
+        results[template] = _timed(bot, lines)
+    return results
+
+
+def _cell_worker(impl, shape, n, seed, samples, queue):
+    try:
+        queue.put(("ok", run_cell(impl, shape, n, seed, samples)))
+    except Exception as exc:  # e.g. pyswip missing; reported as skipped
+        queue.put(("skipped", f"{type(exc).__name__}: {exc}"))
+
+
+def run_suite(impls=IMPLEMENTATIONS, shapes=SHAPES, sizes=(1000, 10_000), seed=0, samples=200):
+    report = {"seed": seed, "samples": samples, "python": platform.python_version(),
+              "results": {}, "skipped": {}}
+    ctx = multiprocessing.get_context("spawn")
+    for impl in impls:
+        for shape in shapes:
+            for n in sizes:
+                key = f"{impl}/{shape}/{n}"
+                queue = ctx.Queue()
+                proc = ctx.Process(target=_cell_worker, args=(impl, shape, n, seed, samples, queue))
+                proc.start()
+                status, payload = queue.get()
+                proc.join()
+                if status == "ok":
+                    report["results"][key] = payload
+                    print(f"{key}: load {payload['load']['mean_us']:.1f} us/statement, "
+                          f"{len(payload) - 1} patterns timed", file=sys.stderr)
+                else:
+                    report["skipped"][key] = payload
+                    print(f"{key}: skipped ({payload})", file=sys.stderr)
+    return report
+
+
+def regressions(report, baseline, tolerance=0.5):
+    """(cell, pattern, baseline us, current us) for every pattern slower than the baseline allows."""
+    slower = []
+    for key, patterns in report["results"].items():
+        reference = baseline.get("results", {}).get(key, {})
+        for pattern, timing in patterns.items():
+            before = reference.get(pattern)
+            if before and timing["median_us"] > before["median_us"] * (1 + tolerance):
+                slower.append((key, pattern, before["median_us"], timing["median_us"]))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--impl", nargs="+", default=list(IMPLEMENTATIONS), choices=IMPLEMENTATIONS)
+    parser.add_argument("--shape", nargs="+", default=list(SHAPES), choices=SHAPES)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--samples", type=int, default=200, help="timed lines per pattern")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown, as a fraction")
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite --baseline with the results")
+    args = parser.parse_args(argv)
+    if args.save_baseline and not args.baseline:
+        parser.error("--save-baseline needs --baseline, the file to write")
+
+    report = run_suite(args.impl, args.shape, args.sizes, args.seed, args.samples)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+    if not args.baseline:
+        return 0
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=1)
+        return 0
+    with open(args.baseline) as f:
+        slower = regressions(report, json.load(f), args.tolerance)
+    for key, pattern, before, now in slower:
+        print(f"{key} {pattern!r}: {before:.1f} -> {now:.1f} us")
+    print(f"{len(slower)} regressions over {args.tolerance:.0%}")
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Differential check of the bot backends.
+
+Feeds the same random transcripts to PrologFamilyBot on the Prolog backend
+and on the native backend and reports every line where the answers differ.
+
+    python differential.py [rounds] [seed]
+"""
+import random
+import sys
+
+from chatbot import PrologFamilyBot
+
+NAMES = ["Ann", "Bob", "Cy", "Dee", "Eve", "Fay", "Gus", "Hal", "Ivy"]
+
+STATEMENTS = [
+    "{0} is the father of {1}.", "{0} is the mother of {1}.",
+    "{0} and {1} are the parents of {2}.", "{0} and {1} are siblings.",
+    "{0} is a brother of {1}.", "{0} is a sister of {1}.",
+    "{0} is a grandmother of {1}.", "{0} is a grandfather of {1}.",
+    "{0} is a child of {1}.", "{0} is a daughter of {1}.", "{0} is a son of {1}.",
+    "{0} is an uncle of {1}.", "{0} is an aunt of {1}.",
+    "{0}, {1} and {2} are children of {3}.",
+]
+
+QUESTIONS = [
+    "Is {0} the father of {1}?", "Is {0} the mother of {1}?",
+    "Is {0} a grandfather of {1}?", "Is {0} a grandmother of {1}?",
+    "Who are the parents of {0}?", "Who is the mother of {0}?", "Who is the father of {0}?",
+    "Are {0} and {1} siblings?", "Who are the siblings of {0}?",
+    "Is {0} a brother of {1}?", "Is {0} a sister of {1}?",
+    "Who are the brothers of {0}?", "Who are the sisters of {0}?",
+    "Is {0} an uncle of {1}?", "Is {0} an aunt of {1}?",
+    "Who are the uncles of {0}?", "Who are the aunts of {0}?",
+    "Is {0} a daughter of {1}?", "Is {0} a son of {1}?", "Is {0} a child of {1}?",
+    "Who are the daughters of {0}?", "Who are the sons of {0}?", "Who are the children of {0}?",
+    "Are {0}, {1} and {2} children of {3}?", "Are {0} and {1} the parents of {2}?",
+    "Are {0} and {1} relatives?", "How is {0} related to {1}?",
+    "Who are the cousins of {0}?", "Who are the second cousins once removed of {0}?",
+]
+
+
+def random_transcript(rng, length=80):
+    lines = []
+    for _ in range(length):
+        template = rng.choice(STATEMENTS if rng.random() < 0.5 else QUESTIONS)
+        lines.append(template.format(*(rng.choice(NAMES) for _ in range(4))))
+    return lines
+
+
+def run(rounds=200, seed=0):
+    rng = random.Random(seed)
+    reference = PrologFamilyBot(backend="prolog")
+    candidate = PrologFamilyBot(backend="native")
+    mismatches = 0
+    for round_no in range(rounds):
+        # pyswip has one engine per process: reuse it and wipe the facts
+        reference._clear_facts()
+        candidate._clear_facts()
+        for line in random_transcript(rng):
+            expected = reference.handle_input(line)
+            actual = candidate.handle_input(line)
+            if expected != actual:
+                mismatches += 1
+                print(f"round {round_no}: {line!r}\n  prolog: {expected}\n  native: {actual}")
+    print(f"{rounds} transcripts, {mismatches} mismatches")
+    return mismatches
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    sys.exit(1 if run(*args) else 0)
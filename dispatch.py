@@ -0,0 +1,78 @@
+import re
+
+NAME = "([A-Z][a-z]*)"
+WILD = "*"
+
+# one step of a pattern's literal prefix: a bare name group or a plain word,
+# followed by the single space that separates it from the next token
+_STEP = re.compile(r"(\(\[A-Z\]\[a-z\]\*\)|[A-Za-z]+)( |\$$|$)")
+_NAME_TOKEN = re.compile(r"[A-Z][a-z]*")
+
+
+def keyword_path(pattern):
+    """Literal token prefix of a sentence pattern.
+
+    Name groups become WILD; the path stops at the first construct that is
+    not a whole word or a bare name (lists, alternations, punctuation).
+    """
+    rest = pattern[1:] if pattern.startswith("^") else pattern
+    path = []
+    while rest:
+        m = _STEP.match(rest)
+        if not m:
+            break
+        token, sep = m.groups()
+        path.append(WILD if token == NAME else token)
+        rest = rest[m.end():]
+        if sep != " ":
+            break
+    return path
+
+
+class IntentDispatcher:
+    """Route a sentence to the first matching (pattern, intent) rule.
+
+    Every pattern is compiled once and indexed in a keyword trie built from
+    its literal word prefix. A line only walks the trie along its own tokens
+    and then tries the few rules found there, in their original order, so the
+    result is the same as a chain of re.match calls while the cost stays flat
+    as rules are added.
+    """
+
+    def __init__(self, rules):
+        self.rules = []
+        self._root = {}
+        for index, (pattern, intent) in enumerate(rules):
+            self.rules.append((re.compile(pattern), intent))
+            node = self._root
+            for token in keyword_path(pattern):
+                node = node.setdefault(token, {})
+            node.setdefault(None, []).append(index)
+
+    def _candidates(self, tokens):
+        found = []
+        frontier = [self._root]
+        for token in tokens:
+            step = []
+            for node in frontier:
+                found.extend(node.get(None, ()))
+                if token in node:
+                    step.append(node[token])
+                if WILD in node and _NAME_TOKEN.fullmatch(token):
+                    step.append(node[WILD])
+            if not step:
+                return found
+            frontier = step
+        for node in frontier:
+            found.extend(node.get(None, ()))
+        return found
+
+    def match(self, text):
+        """Return (intent, groups) for the first matching rule, or (None, ())."""
+        candidates = self._candidates(text.split(" "))
+        for index in sorted(candidates):
+            regex, intent = self.rules[index]
+            m = regex.match(text)
+            if m:
+                return intent, m.groups()
+        return None, ()
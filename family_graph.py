@@ -0,0 +1,380 @@
+from array import array
+from itertools import chain, islice
+
+ABSENT = -2 ** 31  # rank of an id that is in no edge
+
+
+def _rows(offsets, targets, ids):
+    """Tuples of ids[target] per row of an (offsets, targets) table."""
+    it = iter(list(map(ids.__getitem__, targets)))
+    return [tuple(islice(it, n)) for n in map(int.__sub__, offsets[1:], offsets)]
+
+
+class AncestorIndex:
+    """Parent graph kept in an incrementally maintained topological order.
+
+    Every person gets an integer rank, and a parent always ranks below each
+    of its children. ``is_ancestor(a, d)`` is therefore answered "no" in O(1)
+    whenever rank[a] >= rank[d]; otherwise the upward search only visits
+    people ranked between the two. New people are ranked at the bottom when
+    they first appear as a parent and at the top when they first appear as
+    a child, so trees entered top-down or bottom-up never need reordering.
+    Edges that contradict the current order repair it locally
+    (Pearce-Kelly dynamic topological sort).
+
+    People are dense integer ids (PersonRegistry ids), which index the
+    tables directly: a tuple of parents and one of children per id (the
+    shared empty tuple for most leaves and roots) and an int32 rank array,
+    ABSENT for ids in no edge. The native backend reads the same tables.
+    Only ids in the index may be used as table indexes; parents_of() and
+    children_of() take any id.
+    """
+
+    def __init__(self):
+        self.parents = []   # person -> tuple of parents
+        self.children = []  # person -> tuple of children
+        self.rank = array('i')
+        self._low = 0
+        self._high = 0
+
+    def __contains__(self, person):
+        return 0 <= person < len(self.rank) and self.rank[person] != ABSENT
+
+    def parents_of(self, person):
+        return self.parents[person] if person in self else ()
+
+    def children_of(self, person):
+        return self.children[person] if person in self else ()
+
+    def people(self):
+        """Every person in an edge, by id."""
+        return [person for person, rank in enumerate(self.rank) if rank != ABSENT]
+
+    def edges(self):
+        """Every (parent, child) edge, by child."""
+        return [(p, c) for c, ps in enumerate(self.parents) for p in ps]
+
+    def clear(self):
+        """Forget everything, keeping the tables other objects hold on to."""
+        self.parents.clear()
+        self.children.clear()
+        self.rank = array('i')
+        self._low = 0
+        self._high = 0
+
+    def _grow(self, size):
+        missing = size - len(self.rank)
+        if missing > 0:
+            self.parents.extend([()] * missing)
+            self.children.extend([()] * missing)
+            self.rank.extend(array('i', [ABSENT]) * missing)
+
+    def _ensure(self, person, as_parent):
+        if person in self:
+            return
+        self._grow(person + 1)
+        if as_parent:
+            self._low -= 1
+            self.rank[person] = self._low
+        else:
+            self._high += 1
+            self.rank[person] = self._high
+
+    def is_ancestor(self, ancestor, person):
+        """True if ``ancestor`` is reachable from ``person`` via parent links."""
+        if ancestor == person or ancestor not in self or person not in self:
+            return False
+        floor = self.rank[ancestor]
+        if floor >= self.rank[person]:
+            return False
+        stack = [person]
+        seen = {person}
+        while stack:
+            for p in self.parents[stack.pop()]:
+                if p == ancestor:
+                    return True
+                if p not in seen and self.rank[p] > floor:
+                    seen.add(p)
+                    stack.append(p)
+        return False
+
+    def would_create_cycle(self, parent, child):
+        return parent == child or self.is_ancestor(child, parent)
+
+    def add(self, parent, child):
+        """Record parent -> child. The caller must have rejected cycles."""
+        if parent in self.parents_of(child):
+            return
+        self._ensure(parent, True)
+        self._ensure(child, False)
+        self.parents[child] += (parent,)
+        self.children[parent] += (child,)
+        lower, upper = self.rank[child], self.rank[parent]
+        if upper < lower:
+            return
+        # descendants of child ranked below parent, ancestors of parent ranked above child
+        forward = self._collect(child, self.children, lambda r: r < upper)
+        backward = self._collect(parent, self.parents, lambda r: r > lower)
+        moved = sorted(backward, key=self.rank.__getitem__) + sorted(forward, key=self.rank.__getitem__)
+        slots = sorted(self.rank[p] for p in moved)
+        for person, slot in zip(moved, slots):
+            self.rank[person] = slot
+
+    def topological_order(self, edges):
+        """Every person in topological order once ``edges`` are added.
+
+        One Kahn pass over the current graph plus the new edges; returns None
+        if the combined graph would contain a cycle.
+        """
+        indegree = {person: len(self.parents[person]) for person in self.people()}
+        extra = {}
+        for parent, child in set(edges):
+            indegree.setdefault(parent, 0)
+            if parent in self.parents_of(child):
+                continue
+            extra.setdefault(parent, []).append(child)
+            indegree[child] = indegree.get(child, 0) + 1
+        ready = [person for person, degree in indegree.items() if not degree]
+        order = []
+        while ready:
+            person = ready.pop()
+            order.append(person)
+            for child in chain(self.children_of(person), extra.get(person, ())):
+                indegree[child] -= 1
+                if not indegree[child]:
+                    ready.append(child)
+        return order if len(order) == len(indegree) else None
+
+    def try_extend(self, edges):
+        """Add edges one by one, re-ranking only the people between each
+        parent and child; if one would create a cycle, take back the ones
+        already added and return False.
+        """
+        newcomers = {person for edge in edges for person in edge if person not in self}
+        added = []
+        for parent, child in edges:
+            if self.would_create_cycle(parent, child):
+                for p, c in reversed(added):
+                    self.parents[c] = tuple(x for x in self.parents[c] if x != p)
+                    self.children[p] = tuple(x for x in self.children[p] if x != c)
+                for person in newcomers:
+                    if person < len(self.rank):
+                        self.rank[person] = ABSENT
+                return False
+            self.add(parent, child)
+            added.append((parent, child))
+        return True
+
+    def extend(self, edges, order):
+        """Add many edges at once, re-ranking everyone by ``order``."""
+        self._grow(max(order, default=-1) + 1)
+        # one new tuple per person, however many edges they gain
+        parents, children = {}, {}
+        for p, c in dict.fromkeys(edges):
+            if p not in self.parents[c]:
+                parents.setdefault(c, []).append(p)
+                children.setdefault(p, []).append(c)
+        for c, ps in parents.items():
+            self.parents[c] += tuple(ps)
+        for p, cs in children.items():
+            self.children[p] += tuple(cs)
+        rank = self.rank
+        for i, person in enumerate(order):
+            rank[person] = i
+        self._low, self._high = 0, len(order) - 1
+
+    def restore(self, rank, parents, children, ids):
+        """Replace everything with saved tables (see snapshot.read).
+
+        ``parents`` and ``children`` are (offsets, ids) int32 arrays of the
+        rows by id, and ``ids[i]`` is the int object stored for id i, so the
+        rows share the registry's ints instead of holding a copy each.
+        Building one tuple per person is most of the cost of a restore.
+        """
+        self.parents[:] = _rows(*parents, ids)
+        self.children[:] = _rows(*children, ids)
+        self.rank = array('i', rank)
+        present = [r for r in self.rank if r != ABSENT]
+        self._low, self._high = min(present, default=0), max(present, default=0)
+
+    def _collect(self, start, edges, in_window):
+        found = {start}
+        stack = [start]
+        while stack:
+            for nxt in edges[stack.pop()]:
+                if nxt not in found and in_window(self.rank[nxt]):
+                    found.add(nxt)
+                    stack.append(nxt)
+        return found
+
+    def ancestors(self, person):
+        """Set of every ancestor of ``person``."""
+        found = set()
+        stack = list(self.parents_of(person))
+        found.update(stack)
+        while stack:
+            for p in self.parents[stack.pop()]:
+                if p not in found:
+                    found.add(p)
+                    stack.append(p)
+        return found
+
+    def related(self, a, b):
+        """True if ``a`` and ``b`` are relatives: one descends from the other,
+        they share an ancestor, or they share a sibling.
+
+        The first two are settled by one search up both ancestries at once
+        that stops where they meet, so it never looks past the two
+        ancestries; only a shared (half-)sibling needs the sibship check.
+        """
+        if a not in self or b not in self:
+            return False
+        if a == b:  # any parent is an ancestor the person shares with themself
+            return bool(self.parents[a])
+        return self._meet(a, b) or bool(self.siblings(a) & self.siblings(b))
+
+    def _meet(self, a, b):
+        """True if someone is an ancestor of, or the same as, both ``a`` and ``b``."""
+        seen = [{a}, {b}]
+        frontier = [[a], [b]]
+        while frontier[0] or frontier[1]:
+            # grow the smaller side; an exhausted side stays put
+            side = 0 if frontier[0] and (not frontier[1] or len(frontier[0]) <= len(frontier[1])) else 1
+            mine, other = seen[side], seen[1 - side]
+            grown = []
+            for person in frontier[side]:
+                for p in self.parents[person]:
+                    if p in other:
+                        return True
+                    if p not in mine:
+                        mine.add(p)
+                        grown.append(p)
+            frontier[side] = grown
+        return False
+
+    def generation_gap(self, ancestor, person):
+        """Fewest generations from ``person`` up to ``ancestor``, or None if it is not one."""
+        if not self.is_ancestor(ancestor, person):
+            return None
+        # as in is_ancestor, only people ranked above the ancestor can lead to it
+        floor = self.rank[ancestor]
+        level, seen, gap = [person], {person}, 0
+        while level:
+            gap += 1
+            grown = []
+            for child in level:
+                for p in self.parents[child]:
+                    if p == ancestor:
+                        return gap
+                    if p not in seen and self.rank[p] > floor:
+                        seen.add(p)
+                        grown.append(p)
+            level = grown
+        return None
+
+    def nearest_common_ancestor(self, a, b):
+        """(generations up from a, generations up from b) to their closest shared ancestor.
+
+        Closest means fewest generations in total, then the most even split.
+        Both ancestries are walked a generation at a time, always growing the
+        shallower one, and the walk stops as soon as no ancestor still unseen
+        could be closer than the best one found. None if they share no
+        ancestor.
+        """
+        if a not in self or b not in self or a == b:
+            return None
+        depth = [{a: 0}, {b: 0}]
+        frontier = [[a], [b]]
+        reached = [0, 0]
+        best = None
+        while frontier[0] or frontier[1]:
+            # an ancestor not yet seen is at least one generation past a live frontier
+            bound = min(reached[s] for s in (0, 1) if frontier[s]) + 2
+            if best is not None and best < bound:
+                break
+            side = min((s for s in (0, 1) if frontier[s]), key=lambda s: (reached[s], len(frontier[s])))
+            mine, other = depth[side], depth[1 - side]
+            reached[side] += 1
+            grown = []
+            for child in frontier[side]:
+                for p in self.parents[child]:
+                    if p not in mine:
+                        mine[p] = reached[side]
+                        grown.append(p)
+                        # other[p] == 0 is the other person themself: a line of descent
+                        if other.get(p) and (best is None or reached[side] + other[p] < best):
+                            best = reached[side] + other[p]
+            frontier[side] = grown
+        if best is None:
+            return None
+        up_a, up_b = depth
+        return min(((up_a[p], up_b[p]) for p in up_a if p in up_b and up_a[p] and up_b[p]),
+                   key=lambda gaps: (gaps[0] + gaps[1], abs(gaps[0] - gaps[1]), gaps))
+
+    def kinship(self, a, b):
+        """(up, down) generations from ``a`` and from ``b`` to their closest
+        shared ancestor, preferring a line of descent (0 on the ancestor's
+        side); None if they are not related by blood.
+        """
+        gap = self.generation_gap(a, b)
+        if gap is not None:
+            return 0, gap
+        gap = self.generation_gap(b, a)
+        if gap is not None:
+            return gap, 0
+        return self.nearest_common_ancestor(a, b)
+
+    def ancestor_levels(self, person, depth):
+        """Up to ``depth + 1`` sets: the person, then their ancestors by fewest generations up.
+
+        The list stops early at the first generation with nobody in it.
+        """
+        levels = [{person}]
+        seen = {person}
+        for _ in range(depth):
+            grown = {p for child in levels[-1] for p in self.parents[child] if p not in seen}
+            if not grown:
+                break
+            seen |= grown
+            levels.append(grown)
+        return levels
+
+    def cousins(self, person, degree, removed=0):
+        """Everyone who is a ``degree``-th cousin ``removed`` times removed of ``person``.
+
+        The shared ancestor is degree + 1 generations above one of the two
+        and degree + 1 + removed above the other, either way round. The
+        candidates are the descendants, that many generations down, of the
+        person's ancestors at the right level; branches through the
+        person's own nearer ancestors are skipped, as they only lead to
+        closer relatives. Each candidate is then checked with kinship(),
+        so pedigree collapse cannot slip a closer relative in.
+        """
+        if person not in self:
+            return set()
+        near, far = degree + 1, degree + 1 + removed
+        levels = self.ancestor_levels(person, far)
+        found = set()
+        for up, down in {(near, far), (far, near)}:
+            # down: generations from person to the shared ancestor; up: from the cousin
+            if down >= len(levels):
+                continue
+            closer = set().union(*levels[:down])
+            frontier = levels[down]
+            for _ in range(up):
+                frontier = {c for p in frontier for c in self.children[p] if c not in closer}
+                if not frontier:
+                    break
+            for cousin in frontier - found:
+                gaps = self.kinship(cousin, person)
+                if gaps and min(gaps) == near and max(gaps) == far:
+                    found.add(cousin)
+        return found
+
+    def siblings(self, person):
+        """People sharing at least one parent with ``person``."""
+        found = set()
+        for p in self.parents_of(person):
+            found.update(self.children[p])
+        found.discard(person)
+        return found
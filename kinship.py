@@ -0,0 +1,98 @@
+"""English names for blood relationships.
+
+A relationship is described by two generation counts: how many
+generations ``up`` A and ``down`` B are from the closest ancestor they
+share (0 when that ancestor is A or B themself). A's gender code (see
+people.py) picks the gendered word where there is one.
+"""
+from people import FEMALE, MALE
+
+ORDINALS = ["zeroth", "first", "second", "third", "fourth", "fifth",
+            "sixth", "seventh", "eighth", "ninth", "tenth"]
+
+
+def _numbered(n):
+    suffix = "th" if 10 <= n % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
+
+
+def ordinal(n):
+    return ORDINALS[n] if n < len(ORDINALS) else _numbered(n)
+
+
+def parse_ordinal(word):
+    """1 for 'first' or '1st', 2 for 'second' or '2nd', ...; None for anything else."""
+    word = word.lower()
+    if word in ORDINALS:
+        return ORDINALS.index(word)
+    digits = word[:-2]
+    if digits.isdigit() and _numbered(int(digits)) == word:
+        return int(digits)
+    return None
+
+
+def times_removed(k):
+    return {1: "once removed", 2: "twice removed"}.get(k, f"{k} times removed")
+
+
+def parse_removed(phrase):
+    """1 for 'once', 2 for 'twice', k for 'k times'."""
+    return {"once": 1, "twice": 2}.get(phrase) or int(phrase.split()[0])
+
+
+def cousin(degree, removed=0, plural=False):
+    """'first cousin', 'second cousin once removed', 'third cousins', ..."""
+    name = f"{ordinal(degree)} cousin{'s' if plural else ''}"
+    return f"{name} {times_removed(removed)}" if removed else name
+
+
+def _word(code, male, female, neutral):
+    if code == MALE:
+        return male
+    if code == FEMALE:
+        return female
+    return neutral
+
+
+def _greats(n):
+    return "great-" * n
+
+
+def relationship(up, down, code=0, half=False):
+    """What A is to B, e.g. 'great-aunt' or 'second cousin once removed'.
+
+    ``up`` and ``down`` are the generations from A and from B to their
+    closest shared ancestor; ``half`` marks half-siblings.
+    """
+    if up == 0:  # A is B's ancestor
+        base = _word(code, "father", "mother", "parent")
+        if down == 1:
+            return base
+        return _greats(down - 2) + "grand" + base
+    if down == 0:  # A is B's descendant
+        base = _word(code, "son", "daughter", "child")
+        if up == 1:
+            return base
+        return _greats(up - 2) + "grand" + base
+    if up == 1 and down == 1:
+        name = _word(code, "brother", "sister", "sibling")
+        return "half-" + name if half else name
+    if up == 1:
+        g = _greats(down - 2)
+        return _word(code, g + "uncle", g + "aunt", f"{g}uncle or {g}aunt")
+    if down == 1:
+        g = _greats(up - 2)
+        return _word(code, g + "nephew", g + "niece", f"{g}nephew or {g}niece")
+    return cousin(min(up, down) - 1, abs(up - down))
+
+
+def step_sibling(code=0):
+    """Someone who shares a sibling with B but no ancestor."""
+    return "step-" + _word(code, "brother", "sister", "sibling")
+
+
+def article(name):
+    """'the' for a father or mother, who is unique, 'a'/'an' otherwise."""
+    if name in ("father", "mother"):
+        return "the"
+    return "an" if name[0] in "aeiou" else "a"
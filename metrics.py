@@ -0,0 +1,148 @@
+"""Opt-in instrumentation for PrologFamilyBot.
+
+A bot built with ``metrics=True`` records:
+
+    latency      a histogram per intent (learn_father, ask_uncles, ...) of
+                 the time handle_statement / handle_question took; a yes/no
+                 question grouped by answer_batch counts once, with its
+                 share of the group's backend call
+    queries      backend calls per predicate (holds, holds_many, solutions,
+                 first)
+    asserted     facts sent to the backend
+    inferences   SWI-Prolog inferences spent in those calls, read from
+                 statistics/2 (Prolog backend only)
+
+The answer cache counters are added at export time. Without metrics the
+bot keeps ``metrics = None`` and its backend unwrapped, so the only cost
+is one attribute check per line.
+
+    bot.metrics.snapshot(bot.answers)    plain dict, ready for json.dump
+    bot.metrics.prometheus(bot.answers)  Prometheus text exposition format
+"""
+from bisect import bisect_left
+
+# histogram bucket upper bounds, in seconds
+BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # the last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative(self):
+        """(upper bound, observations at or below it) pairs, ending with +Inf."""
+        total = 0
+        for bound, n in zip(BUCKETS + (float("inf"),), self.counts):
+            total += n
+            yield bound, total
+
+
+class Metrics:
+    def __init__(self):
+        self.latency = {}  # intent -> Histogram
+        self.queries = {}  # predicate -> backend calls
+        self.asserted = 0
+        self.inferences = 0
+
+    def observe(self, intent, seconds):
+        histogram = self.latency.get(intent)
+        if histogram is None:
+            histogram = self.latency[intent] = Histogram()
+        histogram.observe(seconds)
+
+    def snapshot(self, cache=None):
+        return {
+            "latency": {intent: {"count": h.count, "sum": h.sum,
+                                 "buckets": {str(bound): n for bound, n in h.cumulative()}}
+                        for intent, h in sorted(self.latency.items())},
+            "queries": dict(sorted(self.queries.items())),
+            "asserted": self.asserted,
+            "inferences": self.inferences,
+            "cache": cache.stats() if cache is not None else {},
+        }
+
+    def prometheus(self, cache=None):
+        lines = ["# TYPE familybot_latency_seconds histogram"]
+        for intent, h in sorted(self.latency.items()):
+            for bound, n in h.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'familybot_latency_seconds_bucket{{intent="{intent}",le="{le}"}} {n}')
+            lines.append(f'familybot_latency_seconds_sum{{intent="{intent}"}} {h.sum!r}')
+            lines.append(f'familybot_latency_seconds_count{{intent="{intent}"}} {h.count}')
+        lines.append("# TYPE familybot_queries_total counter")
+        for pred, n in sorted(self.queries.items()):
+            lines.append(f'familybot_queries_total{{predicate="{pred}"}} {n}')
+        lines.append("# TYPE familybot_asserted_facts_total counter")
+        lines.append(f"familybot_asserted_facts_total {self.asserted}")
+        lines.append("# TYPE familybot_prolog_inferences_total counter")
+        lines.append(f"familybot_prolog_inferences_total {self.inferences}")
+        if cache is not None:
+            for name, value in cache.stats().items():
+                kind = "gauge" if name == "size" else "counter"
+                suffix = "" if name == "size" else "_total"
+                lines.append(f"# TYPE familybot_answer_cache_{name}{suffix} {kind}")
+                lines.append(f"familybot_answer_cache_{name}{suffix} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class CountingBackend:
+    """Backend wrapper that counts queries, asserted facts and Prolog inferences.
+
+    Anything not counted (facts, clear, prolog, ...) goes straight to the
+    wrapped backend.
+    """
+
+    def __init__(self, backend, metrics):
+        self.backend = backend
+        self.metrics = metrics
+        self._prolog = getattr(backend, "prolog", None)
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def _inferences(self):
+        return list(self._prolog.query("statistics(inferences, N)"))[0]["N"]
+
+    def _run(self, pred, method, *args):
+        queries = self.metrics.queries
+        queries[pred] = queries.get(pred, 0) + 1
+        if self._prolog is None:
+            return method(*args)
+        before = self._inferences()
+        try:
+            return method(*args)
+        finally:
+            self.metrics.inferences += self._inferences() - before
+
+    def assert_fact(self, pred, *args):
+        self.metrics.asserted += 1
+        self.backend.assert_fact(pred, *args)
+
+    def assert_bulk(self, facts):
+        self.metrics.asserted += len(facts)
+        self.backend.assert_bulk(facts)
+
+    def assert_tables(self, graph, gender, fathers, mothers):
+        codes = gender.codes(len(gender))
+        self.metrics.asserted += (len(codes) - codes.count(0) + codes.count(3)
+                                  + sum(map(len, graph.parents)) + len(fathers) + len(mothers))
+        self.backend.assert_tables(graph, gender, fathers, mothers)
+
+    def holds(self, pred, *args):
+        return self._run(pred, self.backend.holds, pred, *args)
+
+    def holds_many(self, pred, arg_lists):
+        return self._run(pred, self.backend.holds_many, pred, arg_lists)
+
+    def solutions(self, pred, *args):
+        return self._run(pred, self.backend.solutions, pred, *args)
+
+    def first(self, pred, *args):
+        return self._run(pred, self.backend.first, pred, *args)
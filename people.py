@@ -0,0 +1,95 @@
+"""Registry that interns person names to dense integer ids.
+
+Every name is stored once, as first written; the knowledge base, the
+indexes and the backends only ever see the id. Ids are handed out in
+order from 0, so they can index lists and arrays directly, such as the
+packed GenderArray below.
+"""
+
+UNKNOWN = -1  # id of a name that was never interned; matches no fact
+
+
+class PersonRegistry:
+    def __init__(self, names=()):
+        # names: distinct display names, by id (e.g. from a snapshot)
+        self.names = list(names)  # id -> display name
+        self.ids = dict(zip(self.names, range(len(self.names))))  # display name -> id
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        """The id of ``name``, registering it if it is new."""
+        person = self.ids.get(name)
+        if person is None:
+            person = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return person
+
+    def register(self, fresh):
+        """Add names that already have ids: ``fresh`` maps each new name to
+        the id intern() would have given it, in order. The registry keeps
+        the caller's int objects, so tables built from them share them.
+        """
+        self.ids.update(fresh)
+        self.names.extend(fresh)
+
+    def lookup(self, name):
+        """The id of ``name``, or UNKNOWN without registering it."""
+        return self.ids.get(name, UNKNOWN)
+
+    def display(self, person):
+        return self.names[person]
+
+    def listing(self, people):
+        """Display names of ``people``, deduplicated and sorted, comma-separated."""
+        return ", ".join(sorted({self.names[p] for p in people}, key=str.lower))
+
+
+MALE = 1
+FEMALE = 2
+GENDER_CODES = {'male': MALE, 'female': FEMALE}
+GENDER_NAMES = {MALE: 'male', FEMALE: 'female'}
+
+# packed byte -> the four one-byte codes it holds
+_UNPACK = [bytes((b >> shift) & 3 for shift in (0, 2, 4, 6)) for b in range(256)]
+
+
+class GenderArray:
+    """Gender of every person id, packed two bits per person.
+
+    A code is 0 (unknown), MALE, FEMALE, or MALE | FEMALE when both were
+    asserted. Ids past the end read as unknown.
+    """
+
+    def __init__(self, codes=b""):
+        # codes: one byte per person id, as stored in snapshots
+        codes = bytes(codes) + bytes(-len(codes) % 4)
+        self.data = bytearray(a | b << 2 | c << 4 | d << 6
+                              for a, b, c, d in zip(codes[0::4], codes[1::4], codes[2::4], codes[3::4]))
+
+    def __len__(self):
+        return len(self.data) * 4
+
+    def get(self, person):
+        if person < 0 or person >> 2 >= len(self.data):
+            return 0
+        return self.data[person >> 2] >> ((person & 3) << 1) & 3
+
+    def set(self, person, code):
+        index, shift = person >> 2, (person & 3) << 1
+        if index >= len(self.data):
+            self.data.extend(bytes(index + 1 - len(self.data)))
+        self.data[index] = self.data[index] & ~(3 << shift) & 0xFF | code << shift
+
+    def select(self, people, code):
+        """The people whose gender includes ``code``, in order, in one pass."""
+        data, end = self.data, len(self.data) << 2
+        return [p for p in people if 0 <= p < end and data[p >> 2] >> ((p & 3) << 1) & code]
+
+    def codes(self, count):
+        """One code byte per person id below ``count``."""
+        return b"".join(map(_UNPACK.__getitem__, self.data))[:count].ljust(count, b"\0")
+
+    def clear(self):
+        self.data.clear()
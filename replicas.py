@@ -0,0 +1,129 @@
+"""Process pool of read replicas for question answering.
+
+Questions never change the knowledge base, so they can be answered by any
+number of copies of it. ReplicaPool keeps a primary PrologFamilyBot in
+the calling process, which validates and learns every statement, and N
+worker processes that each bootstrap a replica from the same snapshot.
+
+Every statement that changed the primary's facts (the records the
+write-ahead log would get, rejected ones included) is sent to every
+replica, in order, before handle_input returns. Each replica
+reads writes and questions from one FIFO pipe, so a question always sees
+every statement learned before it was asked: a session reads its own
+writes, and everyone else's.
+
+handle_input sends each question to the next replica round-robin and
+waits for its answer, so one caller asking one question at a time gets
+no parallelism from the pool; only concurrent callers keep several
+replicas busy. answer_batch is the way for a single caller to use them
+all: it learns the batch's statements through handle_input, in order,
+and splits each run of questions between them over every replica.
+"""
+import multiprocessing
+import os
+import threading
+from itertools import cycle
+
+from chatbot import PrologFamilyBot
+
+
+def _replica(conn, snapshot_path, backend):
+    bot = PrologFamilyBot(backend=backend)
+    if snapshot_path:
+        bot.load(snapshot_path)
+    conn.send("ready")
+    while True:
+        kind, payload = conn.recv()
+        if kind == "write":
+            bot.handle_statement(payload)
+        elif kind == "ask":
+            conn.send(bot.answer_batch(payload))
+        else:
+            break
+    conn.close()
+
+
+class ReplicaPool:
+    def __init__(self, workers=None, snapshot_path=None, backend="prolog"):
+        self.primary = PrologFamilyBot(backend=backend)
+        if snapshot_path:
+            self.primary.load(snapshot_path)
+        # spawn: a forked child would inherit the parent's Prolog engine
+        ctx = multiprocessing.get_context("spawn")
+        self.replicas = []
+        for _ in range(workers or os.cpu_count() or 1):
+            conn, child = ctx.Pipe()
+            proc = ctx.Process(target=_replica, args=(child, snapshot_path, backend), daemon=True)
+            proc.start()
+            self.replicas.append((proc, conn, threading.Lock()))
+        for _, conn, _ in self.replicas:
+            conn.recv()
+        self._next = cycle(range(len(self.replicas)))
+        self._write_lock = threading.Lock()
+
+    def handle_input(self, line):
+        text = line.strip()
+        if text.endswith('?'):
+            return self._ask(next(self._next), [text])[0]
+        if not text.endswith('.'):
+            return self.primary.handle_input(text)
+        with self._write_lock:
+            changes = self.primary.changes
+            answer = self.primary.handle_statement(text)
+            if self.primary.changes != changes:
+                for _, conn, lock in self.replicas:
+                    with lock:
+                        conn.send(("write", text))
+        return answer
+
+    def answer_batch(self, lines):
+        """Answer a batch in input order, questions split over the replicas in parallel.
+
+        Any line that is not a question goes through handle_input, so the
+        primary and every replica learn a statement before the questions
+        after it are asked.
+        """
+        answers, run = [], []
+        for line in lines:
+            if line.strip().endswith('?'):
+                run.append(line)
+                continue
+            answers += self._ask_all(run)
+            run = []
+            answers.append(self.handle_input(line))
+        return answers + self._ask_all(run)
+
+    def _ask_all(self, questions):
+        if not questions:
+            return []
+        size = -(-len(questions) // len(self.replicas))
+        chunks = [questions[i:i + size] for i in range(0, len(questions), size)]
+        used = self.replicas[:len(chunks)]
+        for _, _, lock in used:
+            lock.acquire()
+        try:
+            for (_, conn, _), chunk in zip(used, chunks):
+                conn.send(("ask", chunk))
+            return [answer for _, conn, _ in used for answer in conn.recv()]
+        finally:
+            for _, _, lock in used:
+                lock.release()
+
+    def _ask(self, index, questions):
+        _, conn, lock = self.replicas[index]
+        with lock:
+            conn.send(("ask", questions))
+            return conn.recv()
+
+    def close(self):
+        for proc, conn, lock in self.replicas:
+            with lock:
+                conn.send(("close", None))
+            proc.join()
+        self.replicas = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,177 @@
+"""Line-based chat server in front of PrologFamilyBot.
+
+Clients connect over TCP (or a Unix socket), send one statement or question
+per line and get one answer line back. pyswip must not be driven from
+several threads, so a single worker thread builds and owns the bot; the
+asyncio side only parses connections and hands lines over through a
+bounded queue. When the queue is full the client is told to retry instead
+of piling up work, and a request that waits longer than ``timeout``
+seconds is answered with a timeout message and skipped by the worker.
+
+    python server.py [--port 8765 | --unix PATH] [--backend native]
+"""
+import argparse
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+
+from chatbot import PrologFamilyBot
+
+BUSY = "Server busy, please try again."
+TIMED_OUT = "Sorry, that took too long."
+
+
+class InferenceWorker(threading.Thread):
+    """The only thread that touches the bot."""
+
+    def __init__(self, make_bot, queue_size):
+        super().__init__(name="inference", daemon=True)
+        self.make_bot = make_bot
+        self.requests = queue.Queue(maxsize=queue_size)
+        self.ready = threading.Event()
+        self.error = None
+
+    def run(self):
+        try:
+            bot = self.make_bot()
+        except Exception as exc:  # reported by ChatServer.start
+            self.error = exc
+            return
+        finally:
+            self.ready.set()
+        while True:
+            item = self.requests.get()
+            if item is None:
+                break
+            line, future, loop = item
+            if future.cancelled():  # the client already got a timeout
+                continue
+            try:
+                answer = bot.handle_input(line)
+            except Exception as exc:  # keep serving the other sessions
+                answer = f"Error: {exc}"
+            loop.call_soon_threadsafe(_resolve, future, answer)
+        if bot.wal is not None:
+            bot.wal.sync()
+
+    def stop(self):
+        self.requests.put(None)
+        self.join()
+
+
+def _resolve(future, answer):
+    if not future.done():
+        future.set_result(answer)
+
+
+class ChatServer:
+    def __init__(self, make_bot=PrologFamilyBot, queue_size=1024, timeout=5.0, window=100_000):
+        self.worker = InferenceWorker(make_bot, queue_size)
+        self.timeout = timeout
+        self.latencies = deque(maxlen=window)  # seconds, most recent requests
+        self.served = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.sessions = 0
+
+    async def ask(self, line):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        start = time.perf_counter()
+        try:
+            self.worker.requests.put_nowait((line, future, loop))
+        except queue.Full:
+            self.rejected += 1
+            return BUSY
+        try:
+            answer = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            return TIMED_OUT
+        self.latencies.append(time.perf_counter() - start)
+        self.served += 1
+        return answer
+
+    async def handle_client(self, reader, writer):
+        self.sessions += 1
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                line = raw.decode("utf-8", "replace").strip()
+                if line.lower() in ('exit', 'quit'):
+                    writer.write(b"Bye.\n")
+                    break
+                answer = await self.ask(line)
+                writer.write(answer.encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+
+    def report(self):
+        """One line of counters and latency percentiles over the recent window."""
+        times = sorted(self.latencies)
+        if times:
+            p50, p99 = (times[min(len(times) - 1, int(q * len(times)))] * 1e3 for q in (0.5, 0.99))
+            latency = f"p50 {p50:.2f} ms, p99 {p99:.2f} ms"
+        else:
+            latency = "no requests yet"
+        return (f"{self.served} served, {self.rejected} busy, {self.timed_out} timed out, "
+                f"{self.sessions} sessions; {latency}")
+
+    async def start(self, host="127.0.0.1", port=8765, unix=None):
+        self.worker.start()
+        await asyncio.get_running_loop().run_in_executor(None, self.worker.ready.wait)
+        if self.worker.error is not None:
+            raise self.worker.error
+        if unix:
+            return await asyncio.start_unix_server(self.handle_client, path=unix)
+        return await asyncio.start_server(self.handle_client, host, port)
+
+    async def serve(self, host="127.0.0.1", port=8765, unix=None, report_every=10.0):
+        server = await self.start(host, port, unix)
+        where = unix or f"{host}:{port}"
+        print(f"Family bot listening on {where}")
+        try:
+            async with server:
+                while True:
+                    await asyncio.sleep(report_every)
+                    print(self.report())
+        finally:
+            self.worker.stop()
+            print(self.report())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--backend", default="prolog", choices=("prolog", "native"))
+    parser.add_argument("--snapshot", help="snapshot to start from")
+    parser.add_argument("--wal", help="write-ahead log of the statements that changed the facts")
+    parser.add_argument("--queue-size", type=int, default=1024)
+    parser.add_argument("--timeout", type=float, default=5.0, help="seconds per request")
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between stats lines")
+    args = parser.parse_args(argv)
+
+    def make_bot():
+        bot = PrologFamilyBot(wal_path=args.wal, backend=args.backend)
+        bot.recover(args.snapshot)
+        return bot
+
+    server = ChatServer(make_bot, queue_size=args.queue_size, timeout=args.timeout)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix, args.report_every))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Versioned binary snapshots of a family knowledge base.
+
+Layout (little-endian):
+
+    header   magic b"FKBS", uint16 version, uint64 counts of people,
+             parent, father and mother edges
+    names    uint64 byte length, then the display names, UTF-8,
+             newline-separated; a person's id is their position
+    genders  one byte per person: 0 unknown, 1 male, 2 female
+    ranks    one int32 per person: their rank in the ancestry index
+             (family_graph.ABSENT for people in no parent edge)
+    parents  the parent edges as rows by child: int32 offsets, one per
+             person plus one, then the int32 parent ids
+    children the same edges as rows by parent
+    edges    father and mother edges, each an int32 array of
+             (parent id, child id) pairs
+
+The ranks and both directions of the parent graph are stored exactly as
+the ancestry index holds them, so a snapshot is restored without a
+topological sort or any per-fact check. Ids are the PersonRegistry ids of
+the bot that wrote the file. Only this version is read; any other is
+rejected.
+"""
+import os
+import struct
+import sys
+from array import array
+from itertools import accumulate, chain
+
+from family_graph import ABSENT
+
+MAGIC = b"FKBS"
+VERSION = 3
+
+_HEADER = struct.Struct("<4sHQQQQ")
+_LENGTH = struct.Struct("<Q")
+
+
+def _pack(values):
+    values = array('i', values)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def _unpack(data, offset, count):
+    values = array('i')
+    end = offset + count * values.itemsize
+    values.frombytes(data[offset:end])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values, end
+
+
+def _unpack_edges(data, offset, count):
+    flat, end = _unpack(data, offset, count * 2)
+    return list(zip(flat[0::2], flat[1::2])), end
+
+
+def _offsets(rows, count):
+    offsets = array('i', accumulate(map(len, rows), initial=0))
+    offsets.extend(array('i', [offsets[-1]]) * (count + 1 - len(offsets)))
+    return offsets
+
+
+def write(path, names, genders, ranks, parents, children, fathers, mothers):
+    """Write a snapshot atomically: readers see either the old file or the new one.
+
+    ``names`` lists every person by id and ``genders`` holds one code byte
+    per id (see people.GenderArray.codes). ``ranks``, ``parents`` and
+    ``children`` are the tables of a family_graph.AncestorIndex (ids past
+    their end are in no edge), and fathers/mothers are (parent id, child
+    id) pairs.
+    """
+    count = len(names)
+    blob = "\n".join(names).encode("utf-8")
+    ranks = array('i', ranks)
+    ranks.extend(array('i', [ABSENT]) * (count - len(ranks)))
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, count, sum(map(len, parents)), len(fathers), len(mothers)))
+        f.write(_LENGTH.pack(len(blob)))
+        f.write(blob)
+        f.write(genders)
+        f.write(_pack(ranks))
+        for rows in (parents, children):
+            f.write(_pack(_offsets(rows, count)))
+            f.write(_pack(chain.from_iterable(rows)))
+        for edges in (fathers, mothers):
+            f.write(_pack(chain.from_iterable(edges)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read(path):
+    """Return (names, genders, ranks, parents, children, fathers, mothers).
+
+    ``parents`` and ``children`` are (offsets, ids) int32 array pairs, rows
+    by child and by parent; ``ranks`` is an int32 array.
+    """
+    with open(path, "rb") as f:
+        data = memoryview(f.read())
+    magic, version, n_people, n_parents, n_fathers, n_mothers = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a family KB snapshot")
+    if version != VERSION:
+        raise ValueError(f"unsupported snapshot version {version} (expected {VERSION})")
+    offset = _HEADER.size
+    (blob_len,) = _LENGTH.unpack_from(data, offset)
+    offset += _LENGTH.size
+    blob = bytes(data[offset:offset + blob_len]).decode("utf-8")
+    names = blob.split("\n") if n_people else []
+    offset += blob_len
+    genders = bytes(data[offset:offset + n_people])
+    offset += n_people
+    ranks, offset = _unpack(data, offset, n_people)
+    parents, children = [], []
+    for rows in (parents, children):
+        for count in (n_people + 1, n_parents):
+            values, offset = _unpack(data, offset, count)
+            rows.append(values)
+    fathers, offset = _unpack_edges(data, offset, n_fathers)
+    mothers, offset = _unpack_edges(data, offset, n_mothers)
+    return names, genders, ranks, tuple(parents), tuple(children), fathers, mothers
@@ -0,0 +1,101 @@
+"""Independent family knowledge bases, one per tenant, under a memory budget.
+
+Each tenant gets its own PrologFamilyBot. On the Prolog backend the bots
+share the process engine and are kept apart by SWI modules (kb0, kb1, ...);
+an evicted bot is emptied and its module reused for the next tenant
+loaded, so the number of modules never exceeds the number of tenants
+resident at once.
+
+Memory is budgeted in people held in memory across all tenants. After
+every request the least recently used tenants are saved to
+``<directory>/<tenant>.snap`` and dropped until the total fits the budget
+again; the tenant being served always stays. The total is a running
+count, updated when a tenant is loaded, learns a fact or is evicted, so
+checking it costs the same however many tenants are resident. A dropped
+tenant is reloaded from its snapshot (plus its write-ahead log, if
+enabled) on its next request.
+"""
+import os
+from collections import OrderedDict
+from urllib.parse import quote
+
+from chatbot import PrologFamilyBot
+from wal import WriteAheadLog
+
+
+class TenantPool:
+    def __init__(self, directory, budget=1_000_000, backend="prolog", wal=False):
+        self.directory = directory
+        self.budget = budget
+        self.backend = backend
+        self.wal = wal
+        self.resident = OrderedDict()  # tenant -> bot, least recently used first
+        self._sizes = {}  # resident tenant -> people, as last counted
+        self.held = 0     # people held across all resident tenants
+        self._spare = []
+        self._modules = 0
+        self.loads = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, tenant, ext):
+        return os.path.join(self.directory, quote(tenant, safe="") + ext)
+
+    def _new_bot(self):
+        if self._spare:
+            return self._spare.pop()
+        module = f"kb{self._modules}"
+        self._modules += 1
+        return PrologFamilyBot(backend=self.backend, module=module)
+
+    def bot(self, tenant):
+        """The tenant's bot, loading it from disk if it was evicted."""
+        bot = self.resident.get(tenant)
+        if bot is not None:
+            self.resident.move_to_end(tenant)
+            return bot
+        bot = self._new_bot()
+        if self.wal:
+            bot.wal = WriteAheadLog(self._path(tenant, ".wal"))
+        bot.recover(self._path(tenant, ".snap"))
+        self.resident[tenant] = bot
+        self._sizes[tenant] = 0
+        self._recount(tenant)
+        self.loads += 1
+        return bot
+
+    def handle_input(self, tenant, line):
+        answer = self.bot(tenant).handle_input(line)
+        self._recount(tenant)
+        self._enforce_budget()
+        return answer
+
+    def _recount(self, tenant):
+        """Bring ``held`` up to date with what the tenant learned."""
+        size = self.size(tenant)
+        self.held += size - self._sizes[tenant]
+        self._sizes[tenant] = size
+
+    def size(self, tenant):
+        """People the tenant holds in memory."""
+        return len(self.resident[tenant].people)
+
+    def _enforce_budget(self):
+        while self.held > self.budget and len(self.resident) > 1:
+            self.evict(next(iter(self.resident)))
+
+    def evict(self, tenant):
+        """Save a tenant's KB to its snapshot and free the memory it holds."""
+        bot = self.resident.pop(tenant)
+        self.held -= self._sizes.pop(tenant)
+        bot.save(self._path(tenant, ".snap"))
+        if bot.wal is not None:
+            bot.wal.close()
+            bot.wal = None
+        bot._clear_facts()
+        self._spare.append(bot)
+        self.evictions += 1
+
+    def close(self):
+        for tenant in list(self.resident):
+            self.evict(tenant)
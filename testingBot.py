@@ -1,11 +1,39 @@
 import re
 
+from family_graph import AncestorIndex
+from people import PersonRegistry
+
 class SimpleFamilyChatbot:
     def __init__(self):
-        # parent[child] = set of parents
-        self.parent = {}  # child -> set of parents
+        # names are interned once; every structure below is keyed by person id
+        self.people = PersonRegistry()
+        # parent links live in a topologically ordered index (see would_create_cycle)
+        self.ancestry = AncestorIndex()
         # gender[name] = 'male' or 'female'
         self.gender = {}
+        # reverse index: children[parent] = children of parent, also split by gender
+        self.children = self.ancestry.children
+        self.sons = {}
+        self.daughters = {}
+
+    def _ids(self, m):
+        return [self.people.intern(name) for name in m.groups()]
+
+    def _lookup(self, m):
+        return [self.people.lookup(name) for name in m.groups()]
+
+    def _link(self, parent, child):
+        self.ancestry.add(parent, child)
+        if self.gender.get(child) == 'male':
+            self.sons.setdefault(parent, set()).add(child)
+        elif self.gender.get(child) == 'female':
+            self.daughters.setdefault(parent, set()).add(child)
+
+    def _set_gender(self, person, gender):
+        self.gender[person] = gender
+        by_gender = self.sons if gender == 'male' else self.daughters
+        for parent in self.ancestry.parents_of(person):
+            by_gender.setdefault(parent, set()).add(person)
 
     def add_parent(self, parent, child):
         if parent == child:
@@ -13,26 +41,15 @@ class SimpleFamilyChatbot:
         # Check for cycles
         if self.would_create_cycle(parent, child):
             return "That's impossible!"
-        self.parent.setdefault(child, set()).add(parent)
+        self._link(parent, child)
         return "OK! I learned something."
 
     def would_create_cycle(self, parent, child):
-        # Check if parent is already a descendant of child
-        visited = set()
-        
-        def is_descendant(ancestor, descendant):
-            if ancestor == descendant:
-                return True
-            if descendant in visited:
-                return False
-            visited.add(descendant)
-            
-            for p in self.parent.get(descendant, set()):
-                if is_descendant(ancestor, p):
-                    return True
-            return False
-        
-        return is_descendant(child, parent)
+        # Check if parent is already a descendant of child. The index keeps
+        # everyone ranked below their children, so this is rejected at once
+        # unless child ranks below parent, and the iterative search only
+        # visits people ranked between the two.
+        return self.ancestry.would_create_cycle(parent, child)
 
     def handle_statement(self, text):
         text = text.strip().rstrip('.')
@@ -40,42 +57,42 @@ class SimpleFamilyChatbot:
         # A is the father of B
         m = re.match(r"^([A-Z][a-z]*) is the father of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._ids(m)
             if self.gender.get(a) == 'female':
                 return "That's impossible!"
-            self.gender[a] = 'male'
+            self._set_gender(a, 'male')
             return self.add_parent(a, b)
             
         # A is the mother of B
         m = re.match(r"^([A-Z][a-z]*) is the mother of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._ids(m)
             if self.gender.get(a) == 'male':
                 return "That's impossible!"
-            self.gender[a] = 'female'
+            self._set_gender(a, 'female')
             return self.add_parent(a, b)
 
         # A and B are the parents of C
         m = re.match(r"^([A-Z][a-z]*) and ([A-Z][a-z]*) are the parents of ([A-Z][a-z]*)$", text)
         if m:
-            a, b, c = m.groups()
+            a, b, c = self._ids(m)
             if a == c or b == c:
                 return "That's impossible!"
             if self.would_create_cycle(a, c) or self.would_create_cycle(b, c):
                 return "That's impossible!"
-            self.parent.setdefault(c, set()).add(a)
-            self.parent.setdefault(c, set()).add(b)
+            self._link(a, c)
+            self._link(b, c)
             return "OK! I learned something."
 
         # A and B are siblings
         m = re.match(r"^([A-Z][a-z]*) and ([A-Z][a-z]*) are siblings$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._ids(m)
             if a == b:
                 return "That's impossible!"
             # Check if they share a parent
-            parents_a = self.parent.get(a, set())
-            parents_b = self.parent.get(b, set())
+            parents_a = set(self.ancestry.parents_of(a))
+            parents_b = set(self.ancestry.parents_of(b))
             if not parents_a.intersection(parents_b):
                 return "That's impossible!"
             return "OK! I learned something."
@@ -83,13 +100,13 @@ class SimpleFamilyChatbot:
         # A is a brother of B
         m = re.match(r"^([A-Z][a-z]*) is a brother of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._ids(m)
             if self.gender.get(a) == 'female':
                 return "That's impossible!"
-            self.gender[a] = 'male'
+            self._set_gender(a, 'male')
             # Check if they share a parent
-            parents_a = self.parent.get(a, set())
-            parents_b = self.parent.get(b, set())
+            parents_a = set(self.ancestry.parents_of(a))
+            parents_b = set(self.ancestry.parents_of(b))
             if not parents_a.intersection(parents_b):
                 return "That's impossible!"
             return "OK! I learned something."
@@ -97,13 +114,13 @@ class SimpleFamilyChatbot:
         # A is a sister of B
         m = re.match(r"^([A-Z][a-z]*) is a sister of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._ids(m)
             if self.gender.get(a) == 'male':
                 return "That's impossible!"
-            self.gender[a] = 'female'
+            self._set_gender(a, 'female')
             # Check if they share a parent
-            parents_a = self.parent.get(a, set())
-            parents_b = self.parent.get(b, set())
+            parents_a = set(self.ancestry.parents_of(a))
+            parents_b = set(self.ancestry.parents_of(b))
             if not parents_a.intersection(parents_b):
                 return "That's impossible!"
             return "OK! I learned something."
@@ -111,10 +128,10 @@ class SimpleFamilyChatbot:
         # A is a grandmother of B
         m = re.match(r"^([A-Z][a-z]*) is a grandmother of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._ids(m)
             if self.gender.get(a) == 'male':
                 return "That's impossible!"
-            self.gender[a] = 'female'
+            self._set_gender(a, 'female')
             # Check if grandparent relationship exists
             if not self.is_grandparent(a, b):
                 return "That's impossible!"
@@ -123,10 +140,10 @@ class SimpleFamilyChatbot:
         # A is a grandfather of B
         m = re.match(r"^([A-Z][a-z]*) is a grandfather of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._ids(m)
             if self.gender.get(a) == 'female':
                 return "That's impossible!"
-            self.gender[a] = 'male'
+            self._set_gender(a, 'male')
             # Check if grandparent relationship exists
             if not self.is_grandparent(a, b):
                 return "That's impossible!"
@@ -135,34 +152,34 @@ class SimpleFamilyChatbot:
         # A is a child of B
         m = re.match(r"^([A-Z][a-z]*) is a child of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._ids(m)
             return self.add_parent(b, a)
 
         # A is a daughter of B
         m = re.match(r"^([A-Z][a-z]*) is a daughter of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._ids(m)
             if self.gender.get(a) == 'male':
                 return "That's impossible!"
-            self.gender[a] = 'female'
+            self._set_gender(a, 'female')
             return self.add_parent(b, a)
 
         # A is a son of B
         m = re.match(r"^([A-Z][a-z]*) is a son of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._ids(m)
             if self.gender.get(a) == 'female':
                 return "That's impossible!"
-            self.gender[a] = 'male'
+            self._set_gender(a, 'male')
             return self.add_parent(b, a)
 
         # A is an uncle of B
         m = re.match(r"^([A-Z][a-z]*) is an uncle of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._ids(m)
             if self.gender.get(a) == 'female':
                 return "That's impossible!"
-            self.gender[a] = 'male'
+            self._set_gender(a, 'male')
             # Check if uncle relationship is valid
             if not self.is_uncle_aunt(a, b):
                 return "That's impossible!"
@@ -171,10 +188,10 @@ class SimpleFamilyChatbot:
         # A is an aunt of B
         m = re.match(r"^([A-Z][a-z]*) is an aunt of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._ids(m)
             if self.gender.get(a) == 'male':
                 return "That's impossible!"
-            self.gender[a] = 'female'
+            self._set_gender(a, 'female')
             # Check if aunt relationship is valid
             if not self.is_uncle_aunt(a, b):
                 return "That's impossible!"
@@ -184,25 +201,26 @@ class SimpleFamilyChatbot:
         m = re.match(r"^([A-Z][a-z]*(?:, [A-Z][a-z]*)*) and ([A-Z][a-z]*) are children of ([A-Z][a-z]*)$", text)
         if m:
             children_str, last_child, parent = m.groups()
-            children_list = [c.strip() for c in children_str.split(',')]
-            children_list.append(last_child)
+            children_list = [self.people.intern(c.strip()) for c in children_str.split(',')]
+            children_list.append(self.people.intern(last_child))
+            parent = self.people.intern(parent)
             
             for child in children_list:
                 if child == parent:
                     return "That's impossible!"
                 if self.would_create_cycle(parent, child):
                     return "That's impossible!"
-                self.parent.setdefault(child, set()).add(parent)
+                self._link(parent, child)
             return "OK! I learned something."
 
         return "I don't understand that statement."
 
     def is_parent(self, a, b):
-        return a in self.parent.get(b, set())
+        return a in self.ancestry.parents_of(b)
 
     def is_grandparent(self, a, b):
         # Check if a is parent of someone who is parent of b
-        for middle in self.parent.get(b, set()):
+        for middle in self.ancestry.parents_of(b):
             if self.is_parent(a, middle):
                 return True
         return False
@@ -210,13 +228,28 @@ class SimpleFamilyChatbot:
     def is_sibling(self, a, b):
         if a == b:
             return False
-        parents_a = self.parent.get(a, set())
-        parents_b = self.parent.get(b, set())
+        parents_a = set(self.ancestry.parents_of(a))
+        parents_b = set(self.ancestry.parents_of(b))
         return bool(parents_a.intersection(parents_b))
 
+    def siblings_of(self, person):
+        # everyone sharing a parent with person
+        siblings = set()
+        for parent in self.ancestry.parents_of(person):
+            siblings.update(self.children[parent])
+        siblings.discard(person)
+        return siblings
+
+    def parent_siblings_of(self, person):
+        # uncles and aunts: siblings of any parent of person
+        found = set()
+        for parent in self.ancestry.parents_of(person):
+            found |= self.siblings_of(parent)
+        return found
+
     def is_uncle_aunt(self, a, b):
         # a is uncle/aunt of b if a is sibling of any parent of b
-        for parent in self.parent.get(b, set()):
+        for parent in self.ancestry.parents_of(b):
             if self.is_sibling(a, parent):
                 return True
         return False
@@ -227,261 +260,198 @@ class SimpleFamilyChatbot:
         # Is A the father of B?
         m = re.match(r"^Is ([A-Z][a-z]*) the father of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._lookup(m)
             return "Yes." if self.is_parent(a, b) and self.gender.get(a) == 'male' else "No."
             
         # Is A the mother of B?
         m = re.match(r"^Is ([A-Z][a-z]*) the mother of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._lookup(m)
             return "Yes." if self.is_parent(a, b) and self.gender.get(a) == 'female' else "No."
             
         # Is A a grandfather of B?
         m = re.match(r"^Is ([A-Z][a-z]*) a grandfather of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._lookup(m)
             return "Yes." if self.is_grandparent(a, b) and self.gender.get(a) == 'male' else "No."
             
         # Is A a grandmother of B?
         m = re.match(r"^Is ([A-Z][a-z]*) a grandmother of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._lookup(m)
             return "Yes." if self.is_grandparent(a, b) and self.gender.get(a) == 'female' else "No."
 
         # Who are the parents of C?
         m = re.match(r"^Who are the parents of ([A-Z][a-z]*)$", text)
         if m:
             (child,) = m.groups()
-            parents = self.parent.get(child, set())
+            child_id = self.people.lookup(child)
+            parents = self.ancestry.parents_of(child_id)
             if not parents:
                 return f"No parents of {child} found."
-            parents_display = ", ".join(sorted(parents))
-            return f"Parents of {child}: {parents_display}."
+            return f"Parents of {child}: {self.people.listing(parents)}."
 
         # Who is the mother of C?
         m = re.match(r"^Who is the mother of ([A-Z][a-z]*)$", text)
         if m:
             (child,) = m.groups()
-            parents = self.parent.get(child, set())
+            child_id = self.people.lookup(child)
+            parents = set(self.ancestry.parents_of(child_id))
             mothers = [p for p in parents if self.gender.get(p) == 'female']
             if not mothers:
                 return f"No mother of {child} found."
-            return f"Mother of {child}: {mothers[0]}."
+            return f"Mother of {child}: {self.people.display(mothers[0])}."
 
         # Who is the father of C?
         m = re.match(r"^Who is the father of ([A-Z][a-z]*)$", text)
         if m:
             (child,) = m.groups()
-            parents = self.parent.get(child, set())
+            child_id = self.people.lookup(child)
+            parents = set(self.ancestry.parents_of(child_id))
             fathers = [p for p in parents if self.gender.get(p) == 'male']
             if not fathers:
                 return f"No father of {child} found."
-            return f"Father of {child}: {fathers[0]}."
+            return f"Father of {child}: {self.people.display(fathers[0])}."
 
         # Are A and B siblings?
         m = re.match(r"^Are ([A-Z][a-z]*) and ([A-Z][a-z]*) siblings$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._lookup(m)
             return "Yes." if self.is_sibling(a, b) else "No."
 
         # Who are the siblings of X?
         m = re.match(r"^Who are the siblings of ([A-Z][a-z]*)$", text)
         if m:
             (person,) = m.groups()
-            siblings = []
-            # Get all known people
-            all_people = set()
-            all_people.update(self.gender.keys())
-            all_people.update(self.parent.keys())
-            for parents in self.parent.values():
-                all_people.update(parents)
-            
-            for other_person in all_people:
-                if other_person != person and self.is_sibling(person, other_person):
-                    siblings.append(other_person)
-            
+            person_id = self.people.lookup(person)
+            siblings = self.siblings_of(person_id)
             if not siblings:
                 return f"No siblings of {person} found."
-            return f"Siblings of {person}: " + ", ".join(sorted(siblings)) + "."
+            return f"Siblings of {person}: {self.people.listing(siblings)}."
 
         # Is A a brother of B?
         m = re.match(r"^Is ([A-Z][a-z]*) a brother of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._lookup(m)
             return "Yes." if self.is_sibling(a, b) and self.gender.get(a) == 'male' else "No."
 
         # Is A a sister of B?
         m = re.match(r"^Is ([A-Z][a-z]*) a sister of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._lookup(m)
             return "Yes." if self.is_sibling(a, b) and self.gender.get(a) == 'female' else "No."
 
         # Who are the brothers of X?
         m = re.match(r"^Who are the brothers of ([A-Z][a-z]*)$", text)
         if m:
             (person,) = m.groups()
-            brothers = []
-            # Check all known people
-            all_people = set()
-            all_people.update(self.gender.keys())
-            all_people.update(self.parent.keys())
-            for parents in self.parent.values():
-                all_people.update(parents)
-            
-            for other_person in all_people:
-                if (other_person != person and 
-                    self.is_sibling(person, other_person) and 
-                    self.gender.get(other_person) == 'male'):
-                    brothers.append(other_person)
-            
+            person_id = self.people.lookup(person)
+            brothers = [s for s in self.siblings_of(person_id) if self.gender.get(s) == 'male']
             if not brothers:
                 return f"No brothers of {person} found."
-            return f"Brothers of {person}: " + ", ".join(sorted(brothers)) + "."
+            return f"Brothers of {person}: {self.people.listing(brothers)}."
 
         # Who are the sisters of X?
         m = re.match(r"^Who are the sisters of ([A-Z][a-z]*)$", text)
         if m:
             (person,) = m.groups()
-            sisters = []
-            # Check all known people
-            all_people = set()
-            all_people.update(self.gender.keys())
-            all_people.update(self.parent.keys())
-            for parents in self.parent.values():
-                all_people.update(parents)
-            
-            for other_person in all_people:
-                if (other_person != person and 
-                    self.is_sibling(person, other_person) and 
-                    self.gender.get(other_person) == 'female'):
-                    sisters.append(other_person)
-            
+            person_id = self.people.lookup(person)
+            sisters = [s for s in self.siblings_of(person_id) if self.gender.get(s) == 'female']
             if not sisters:
                 return f"No sisters of {person} found."
-            return f"Sisters of {person}: " + ", ".join(sorted(sisters)) + "."
+            return f"Sisters of {person}: {self.people.listing(sisters)}."
 
         # Is A an uncle of B?
         m = re.match(r"^Is ([A-Z][a-z]*) an uncle of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._lookup(m)
             return "Yes." if self.is_uncle_aunt(a, b) and self.gender.get(a) == 'male' else "No."
 
         # Is A an aunt of B?
         m = re.match(r"^Is ([A-Z][a-z]*) an aunt of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._lookup(m)
             return "Yes." if self.is_uncle_aunt(a, b) and self.gender.get(a) == 'female' else "No."
 
         # Who are the uncles of X?
         m = re.match(r"^Who are the uncles of ([A-Z][a-z]*)$", text)
         if m:
             (person,) = m.groups()
-            uncles = []
-            # Get all known people
-            all_people = set()
-            all_people.update(self.gender.keys())
-            all_people.update(self.parent.keys())
-            for parents in self.parent.values():
-                all_people.update(parents)
-            
-            for other_person in all_people:
-                if (self.is_uncle_aunt(other_person, person) and 
-                    self.gender.get(other_person) == 'male'):
-                    uncles.append(other_person)
-            
+            person_id = self.people.lookup(person)
+            uncles = [s for s in self.parent_siblings_of(person_id) if self.gender.get(s) == 'male']
             if not uncles:
                 return f"No uncles of {person} found."
-            return f"Uncles of {person}: " + ", ".join(sorted(uncles)) + "."
+            return f"Uncles of {person}: {self.people.listing(uncles)}."
 
         # Who are the aunts of X?
         m = re.match(r"^Who are the aunts of ([A-Z][a-z]*)$", text)
         if m:
             (person,) = m.groups()
-            aunts = []
-            # Get all known people
-            all_people = set()
-            all_people.update(self.gender.keys())
-            all_people.update(self.parent.keys())
-            for parents in self.parent.values():
-                all_people.update(parents)
-            
-            for other_person in all_people:
-                if (self.is_uncle_aunt(other_person, person) and 
-                    self.gender.get(other_person) == 'female'):
-                    aunts.append(other_person)
-            
+            person_id = self.people.lookup(person)
+            aunts = [s for s in self.parent_siblings_of(person_id) if self.gender.get(s) == 'female']
             if not aunts:
                 return f"No aunts of {person} found."
-            return f"Aunts of {person}: " + ", ".join(sorted(aunts)) + "."
+            return f"Aunts of {person}: {self.people.listing(aunts)}."
 
         # Is A a daughter of B?
         m = re.match(r"^Is ([A-Z][a-z]*) a daughter of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._lookup(m)
             return "Yes." if self.is_parent(b, a) and self.gender.get(a) == 'female' else "No."
 
         # Is A a son of B?
         m = re.match(r"^Is ([A-Z][a-z]*) a son of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._lookup(m)
             return "Yes." if self.is_parent(b, a) and self.gender.get(a) == 'male' else "No."
 
         # Is A a child of B?
         m = re.match(r"^Is ([A-Z][a-z]*) a child of ([A-Z][a-z]*)$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._lookup(m)
             return "Yes." if self.is_parent(b, a) else "No."
 
         # Who are the daughters of X?
         m = re.match(r"^Who are the daughters of ([A-Z][a-z]*)$", text)
         if m:
             (person,) = m.groups()
-            daughters = []
-            for child in self.parent.keys():
-                if self.is_parent(person, child) and self.gender.get(child) == 'female':
-                    daughters.append(child)
-            
+            person_id = self.people.lookup(person)
+            daughters = self.daughters.get(person_id, set())
             if not daughters:
                 return f"No daughters of {person} found."
-            return f"Daughters of {person}: " + ", ".join(sorted(daughters)) + "."
+            return f"Daughters of {person}: {self.people.listing(daughters)}."
 
         # Who are the sons of X?
         m = re.match(r"^Who are the sons of ([A-Z][a-z]*)$", text)
         if m:
             (person,) = m.groups()
-            sons = []
-            for child in self.parent.keys():
-                if self.is_parent(person, child) and self.gender.get(child) == 'male':
-                    sons.append(child)
-            
+            person_id = self.people.lookup(person)
+            sons = self.sons.get(person_id, set())
             if not sons:
                 return f"No sons of {person} found."
-            return f"Sons of {person}: " + ", ".join(sorted(sons)) + "."
+            return f"Sons of {person}: {self.people.listing(sons)}."
 
         # Who are the children of X?
         m = re.match(r"^Who are the children of ([A-Z][a-z]*)$", text)
         if m:
             (person,) = m.groups()
-            children = []
-            for child in self.parent.keys():
-                if self.is_parent(person, child):
-                    children.append(child)
-            
+            person_id = self.people.lookup(person)
+            children = self.ancestry.children_of(person_id)
             if not children:
                 return f"No children of {person} found."
-            return f"Children of {person}: " + ", ".join(sorted(children)) + "."
+            return f"Children of {person}: {self.people.listing(children)}."
 
         # Are A and B the parents of C?
         m = re.match(r"^Are ([A-Z][a-z]*) and ([A-Z][a-z]*) the parents of ([A-Z][a-z]*)$", text)
         if m:
-            a, b, c = m.groups()
-            parents_c = self.parent.get(c, set())
+            a, b, c = self._lookup(m)
+            parents_c = self.ancestry.parents_of(c)
             return "Yes." if a in parents_c and b in parents_c else "No."
 
         # Are A, B and C children of D?
         m = re.match(r"^Are ([A-Z][a-z]*), ([A-Z][a-z]*) and ([A-Z][a-z]*) children of ([A-Z][a-z]*)$", text)
         if m:
-            a, b, c, d = m.groups()
+            a, b, c, d = self._lookup(m)
             return "Yes." if (self.is_parent(d, a) and 
                             self.is_parent(d, b) and 
                             self.is_parent(d, c)) else "No."
@@ -489,7 +459,7 @@ class SimpleFamilyChatbot:
         # Are A and B relatives?
         m = re.match(r"^Are ([A-Z][a-z]*) and ([A-Z][a-z]*) relatives$", text)
         if m:
-            a, b = m.groups()
+            a, b = self._lookup(m)
             # Check various relationships
             if (self.is_parent(a, b) or self.is_parent(b, a) or
                 self.is_sibling(a, b) or
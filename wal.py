@@ -0,0 +1,69 @@
+"""Append-only write-ahead log of the statements that changed the facts.
+
+Records are single text lines. Appends are group-committed: the file is
+fsynced once ``group_size`` records are pending or ``max_delay`` seconds
+after the first unsynced record, whichever comes first, so sustained
+ingestion pays one fsync per group instead of one per statement. A crash
+can lose at most the records of the group that was still open.
+"""
+import os
+import threading
+
+
+class WriteAheadLog:
+    def __init__(self, path, group_size=64, max_delay=0.05):
+        self.path = path
+        self.group_size = group_size
+        self.max_delay = max_delay
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._timer = None
+
+    def append(self, record):
+        with self._lock:
+            self._file.write(record + "\n")
+            self._pending += 1
+            if self._pending >= self.group_size:
+                self._sync()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.max_delay, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def sync(self):
+        """Make every appended record durable."""
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+
+    def truncate(self):
+        """Drop every record, e.g. once a snapshot covers them (checkpoint)."""
+        with self._lock:
+            self._sync()
+            self._file.close()
+            self._file = open(self.path, "w", encoding="utf-8")
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            self._file.close()
+
+
+def read_log(path):
+    """Yield the complete records of a log; a torn final line is skipped."""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.endswith("\n"):
+                yield line[:-1]